@@ -1,11 +1,225 @@
 """Bot model for TheCardGuardian."""
 
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
 import discord
+from utils.admission import AdmissionController, CommandBusy
+from utils.card_cache import create_card_cache
+from utils.diagnostics import Diagnostics
+from utils.http_cache import HTTPCache
+from utils.offload import CardWorkExecutor
 
 
 class TheCardGuardian(discord.Bot):
     """TheCardGuardian Bot."""
 
+    HTTP_CACHE_DIR = ".cache/http"
+    CARD_CACHE_TTL = 6 * 60 * 60
+    CARD_NEAR_CACHE_TTL = 60
+    COMMAND_FINGERPRINT_PATH = ".cache/command_tree.sha256"
+
+    def __init__(
+        self,
+        *args,  # noqa: ANN002
+        launched_at: float | None = None,
+        **kwargs,  # noqa: ANN003
+    ) -> None:
+        """Initialize the bot and the state shared by its cogs.
+
+        launched_at is the time.monotonic() at which the process started, used
+        to report the startup time. It defaults to when the bot is created.
+
+        The provider HTTP cache lives in HTTP_CACHE_DIR unless overridden with
+        the HTTP_CACHE_DIR environment variable; set it to an empty string to
+        disable caching. The directory is kept under HTTP_CACHE_MAX_MB
+        megabytes (default 256), deleting the oldest entries first.
+
+        Diagnostics are enabled with DIAGNOSTICS=1, and command profiling with
+        DIAGNOSTICS_PROFILE=1. Commands slower than SLOW_COMMAND_SECONDS
+        (default 2) are profiled.
+
+        Large card payloads are parsed in a pool of CARD_WORKERS processes
+        (default 2), 0 parses everything on the event loop.
+
+        Looked up cards are cached in this process, or shared between bot
+        processes when CARD_CACHE_URL is a redis:// URL (see utils.card_cache).
+
+        Slash commands go through admission control, whose total, per-guild and
+        per-user limits can be set with ADMISSION_CAPACITY,
+        ADMISSION_GUILD_CAPACITY and ADMISSION_USER_CONCURRENCY (see
+        utils.admission).
+
+        Slash commands are only synced with Discord when the command tree's
+        fingerprint, stored in COMMAND_FINGERPRINT_PATH (overridable with the
+        COMMAND_FINGERPRINT_PATH environment variable), has changed. Set
+        FORCE_COMMAND_SYNC=1 to sync regardless.
+        """
+        super().__init__(*args, **kwargs)
+        self.launched_at = time.monotonic() if launched_at is None else launched_at
+        self.startup_time = None
+        self.command_sync = None
+        http_cache_dir = os.getenv("HTTP_CACHE_DIR", self.HTTP_CACHE_DIR)
+        self.http_cache = HTTPCache(
+            Path(http_cache_dir) if http_cache_dir else None,
+            max_size=int(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024,
+        )
+
+        self.diagnostics = Diagnostics(
+            enabled=os.getenv("DIAGNOSTICS") == "1",
+            profile=os.getenv("DIAGNOSTICS_PROFILE") == "1",
+            slow_command_threshold=float(os.getenv("SLOW_COMMAND_SECONDS", "2")),
+        )
+        self.admission = AdmissionController(
+            capacity=int(
+                os.getenv("ADMISSION_CAPACITY", str(AdmissionController.CAPACITY)),
+            ),
+            guild_capacity=int(
+                os.getenv(
+                    "ADMISSION_GUILD_CAPACITY",
+                    str(AdmissionController.GUILD_CAPACITY),
+                ),
+            ),
+            user_concurrency=int(
+                os.getenv(
+                    "ADMISSION_USER_CONCURRENCY",
+                    str(AdmissionController.USER_CONCURRENCY),
+                ),
+            ),
+        )
+        self.before_invoke(self.__before_command)
+        self.after_invoke(self.__after_command)
+
+        self.card_work = CardWorkExecutor(int(os.getenv("CARD_WORKERS", "2")))
+        self.card_cache = create_card_cache(
+            os.getenv("CARD_CACHE_URL", ""),
+            ttl=self.CARD_CACHE_TTL,
+            near_ttl=self.CARD_NEAR_CACHE_TTL,
+        )
+
+    async def __before_command(self, ctx: discord.ApplicationContext) -> None:
+        """Admit a slash command, then start tracing it once it may run.
+
+        Commands turned away raise CommandBusy, which skips the after hook, so
+        the diagnostics only trace commands that ran.
+        This is a private method and should not be called outside of this class.
+        """
+        await self.admission.before_command(ctx)
+        await self.diagnostics.before_command(ctx)
+
+    async def __after_command(self, ctx: discord.ApplicationContext) -> None:
+        """Finish tracing a slash command and give its capacity back.
+
+        This is a private method and should not be called outside of this class.
+        """
+        await self.diagnostics.after_command(ctx)
+        await self.admission.after_command(ctx)
+
+    async def on_application_command_error(
+        self,
+        ctx: discord.ApplicationContext,
+        error: discord.DiscordException,
+    ) -> None:
+        """Answer commands turned away by admission control, report other errors.
+
+        Parameter: discord.ApplicationContext, discord.DiscordException
+        Return Type: None
+        """
+        if isinstance(error, CommandBusy):
+            if ctx.response.is_done():
+                # The command was deferred while queued, and the first followup
+                # would replace its public "thinking" message.
+                with contextlib.suppress(discord.HTTPException):
+                    await ctx.interaction.delete_original_response()
+            await ctx.respond(str(error), ephemeral=True)
+            return
+
+        await super().on_application_command_error(ctx, error)
+
+    async def close(self) -> None:
+        """Close the bot, its card cache connections and card worker processes."""
+        self.card_work.shutdown()
+        await self.card_cache.close()
+        await super().close()
+
+    def __get_command_tree_fingerprint(self) -> str:
+        """Get a hash of every slash command as it would be registered.
+
+        The application id is part of the hash, so switching tokens syncs too.
+        This is a private method and should not be called outside of this class.
+        """
+        commands = sorted(
+            json.dumps(
+                {"guild_ids": command.guild_ids, **command.to_dict()},
+                sort_keys=True,
+            )
+            for command in self.pending_application_commands
+        )
+        tree = json.dumps({"application_id": self.user.id, "commands": commands})
+        return hashlib.sha256(tree.encode()).hexdigest()
+
+    def __load_command_fingerprint(self, path: Path) -> str | None:
+        """Load the fingerprint of the last synced command tree, if any.
+
+        This is a private method and should not be called outside of this class.
+        """
+        try:
+            return path.read_text().strip()
+        except OSError:
+            return None
+
+    def __store_command_fingerprint(self, path: Path, fingerprint: str) -> None:
+        """Store the fingerprint of the synced command tree, atomically.
+
+        This is a private method and should not be called outside of this class.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(fingerprint)
+        temp_path.replace(path)
+
+    async def on_connect(self) -> None:
+        """Sync the slash commands with Discord, if they changed since the last sync.
+
+        Unsynced commands are still dispatched, py-cord matches interactions to
+        commands by name when it doesn't know their ids.
+        Parameter: None
+        Return Type: None
+        """
+        if not self.auto_sync_commands:
+            return
+
+        fingerprint_path = Path(
+            os.getenv("COMMAND_FINGERPRINT_PATH", self.COMMAND_FINGERPRINT_PATH),
+        )
+        fingerprint = self.__get_command_tree_fingerprint()
+        force = os.getenv("FORCE_COMMAND_SYNC") == "1"
+        previous_fingerprint = await asyncio.to_thread(
+            self.__load_command_fingerprint,
+            fingerprint_path,
+        )
+
+        if not force and previous_fingerprint == fingerprint:
+            self.command_sync = "skipped, the commands are unchanged"
+            print("Slash commands are unchanged, skipping the sync.")  # noqa: T201
+            return
+
+        started = time.monotonic()
+        await self.sync_commands(force=force)
+        self.command_sync = f"synced in {time.monotonic() - started:.2f}s"
+        print(f"Slash commands {self.command_sync}.")  # noqa: T201
+
+        await asyncio.to_thread(
+            self.__store_command_fingerprint,
+            fingerprint_path,
+            fingerprint,
+        )
+
     async def on_ready(self) -> None:
         """Define what happens when the bot is ready.
 
@@ -14,6 +228,10 @@ class TheCardGuardian(discord.Bot):
         """
         print(f"{self.user.name} is ready and online!")  # noqa: T201
         print(f"ID: {self.user.id}")  # noqa: T201
+        if self.startup_time is None:
+            self.startup_time = time.monotonic() - self.launched_at
+            print(f"Started up in {self.startup_time:.2f}s.")  # noqa: T201
+        self.diagnostics.start()
 
     async def on_guild_join(self, guild: discord.Guild) -> None:
         """Define what happens when the bot joins a guild.
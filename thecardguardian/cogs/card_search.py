@@ -0,0 +1,158 @@
+"""TheCardGuardian CardSearch Cog."""
+
+from __future__ import annotations
+
+import asyncio
+import traceback
+
+import discord
+from discord.commands import Option
+from discord.ext import commands
+from discord.ext.pages import Paginator
+from utils.card_name_matcher import edit_distance, normalize_card_name
+from utils.diagnostics import phase
+
+
+class CardSearch(commands.Cog):
+    """TheCardGuardian CardSearch Cog."""
+
+    GAMES = (
+        ("MagicTCG", "Magic: The Gathering"),
+        ("Yugioh", "Yu-Gi-Oh!"),
+    )
+    SEARCH_DEADLINE = 8
+
+    def __init__(self, bot: discord.Bot) -> None:
+        """Initialize the CardSearch cog."""
+        self.bot = bot
+
+    def __get_match_distance(self, query: str, card_name: str) -> int:
+        """Get how far a found card's name is from the query, lower is better.
+
+        This is a private method and should not be called outside of this class.
+        """
+        normalized_query = normalize_card_name(query)
+        normalized_card_name = normalize_card_name(card_name)
+        return edit_distance(
+            normalized_query,
+            normalized_card_name,
+            max(len(normalized_query), len(normalized_card_name)),
+        )
+
+    def __get_found_cards(
+        self,
+        query: str,
+        lookups: dict[asyncio.Task, str],
+        done: set[asyncio.Task],
+        failed: list[str],
+    ) -> list[tuple[str, list[discord.Embed]]]:
+        """Get the cards found by finished lookups.
+
+        Lookups that raised are logged and their game added to failed.
+        This is a private method and should not be called outside of this class.
+        """
+        found = []
+        for task in done:
+            if task.exception() is not None:
+                failed.append(lookups[task])
+                print(f"{lookups[task]} card search for `{query}` failed:")  # noqa: T201
+                traceback.print_exception(task.exception())
+            elif task.result() is not None:
+                found.append(task.result())
+
+        return found
+
+    def __describe_missing_games(self, failed: list[str], timed_out: list[str]) -> str:
+        """Get the message telling which games failed or did not answer in time.
+
+        This is a private method and should not be called outside of this class.
+        """
+        messages = []
+        if failed:
+            messages.append(
+                f"{' and '.join(failed)} could not be searched, please try again later.",  # noqa: E501
+            )
+        if timed_out:
+            messages.append(f"{' and '.join(timed_out)} did not answer in time.")
+
+        return " ".join(messages)
+
+    @discord.slash_command(
+        name="cardsearch",
+        description="Search for named Magic: The Gathering and Yu-Gi-Oh! cards at the same time",  # noqa: E501
+    )
+    async def card_search(
+        self,
+        ctx: discord.ApplicationContext,
+        query: str = Option(
+            str,
+            "Enter the name of the card you're searching for",
+        ),
+    ) -> None:
+        """Search for named cards in every game at once.
+
+        Both games are looked up concurrently under one deadline. Results are
+        shown as soon as the first game answers, and re-ranked by how closely the
+        card name matches the query when the other one does. A game whose
+        lookup fails or misses the deadline is reported to the user.
+        """
+        lookups = {
+            asyncio.create_task(cog.lookup_named_card(query)): game
+            for cog_name, game in self.GAMES
+            if (cog := self.bot.get_cog(cog_name)) is not None
+        }
+
+        results = []
+        failed = []
+        paginator = None
+        pending = set(lookups)
+        deadline = asyncio.get_running_loop().time() + self.SEARCH_DEADLINE
+        try:
+            with phase("send"):
+                await ctx.respond(
+                    f"Returning card search result for query `{query}` from {' and '.join(lookups.values())}",  # noqa: E501
+                )
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(deadline - asyncio.get_running_loop().time(), 0),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+
+                found = self.__get_found_cards(query, lookups, done, failed)
+                if not found:
+                    continue
+
+                for card_name, embeds in found:
+                    distance = self.__get_match_distance(query, card_name)
+                    results.append((distance, len(results), embeds))
+                pages = [embed for *_, embeds in sorted(results) for embed in embeds]
+
+                with phase("send"):
+                    if paginator is None:
+                        paginator = Paginator(pages=pages)
+                        await paginator.respond(ctx.interaction, ephemeral=True)
+                    else:
+                        await paginator.update(pages=pages)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if failed or pending:
+            await ctx.respond(
+                self.__describe_missing_games(
+                    failed,
+                    [lookups[task] for task in pending],
+                ),
+                ephemeral=True,
+            )
+        elif paginator is None:
+            await ctx.respond(f"Query `{query}` is not found.")
+
+
+def setup(bot: discord.Bot) -> None:
+    """Set up the CardSearch cog."""
+    bot.add_cog(CardSearch(bot))
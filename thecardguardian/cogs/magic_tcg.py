@@ -2,14 +2,31 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
-import urllib
+import urllib.parse
 
 import aiohttp
 import discord
 from discord.commands import Option
 from discord.ext import commands, tasks
 from discord.ext.pages import Paginator
+from utils.card_name_matcher import (
+    CardNameMatch,
+    CardNameMatcher,
+    normalize_card_name,
+)
+from utils.card_records import (
+    CARD_RECORD_VERSION,
+    load_magic_card,
+    parse_magic_card_names,
+    parse_magic_card_prices,
+    parse_magic_cards,
+    parse_price,
+    trim_magic_card,
+)
+from utils.diagnostics import phase
+from utils.price_watch import PriceAlert, PriceWatch, PriceWatchList
 
 
 class MagicTCG(commands.Cog):
@@ -26,29 +43,45 @@ class MagicTCG(commands.Cog):
     daily_card_minute = None
     first_run = True
 
+    card_name_matcher = None
+
     DATE_FORMAT = "%d %B %Y"
     EMBED_FOOTER = "TheCardGuardian\nTheCardGuardian is not affiliated with Scryfall or YGOPRODeck or DigimonCard.io or Magic: The Gathering or Yu-Gi-Oh! or Digimon Card Game.\nAll rights goes to their respective owners."  # noqa: E501
+    SCRYFALL_API_URL = "https://api.scryfall.com"
     REQ_SUCCESS = 200
     REQ_NOT_FOUND = 404
     PROPER_SPLITTED_TIME_LENGTH = 2
     MAX_HOUR = 23
     MAX_SECOND = 59
+    EMBEDS_PER_YIELD = 100
+    PRICE_BATCH_SIZE = 75
+    PRICE_BATCH_DELAY = 0.1
+    DEFAULT_WATCH_PERCENT = 10.0
+    ALERTS_PER_MESSAGE = 20
+    CARD_NAME_INDEX_REFRESH_HOURS = 24
+    CARD_NAME_INDEX_RETRY_MINUTES = 5
 
     def __init__(self, bot: discord.Bot) -> None:
         """Initialize the MagicTCG cog."""
         self.bot = bot
+        self.price_watch = PriceWatchList("Magic: The Gathering")
         self.send_daily_magic_card.start()
+        self.refresh_card_name_index.start()
+        self.refresh_watched_prices.start()
 
     async def __get_and_set_random_magic_card(self) -> None:
         """Get a random card from the Scryfall API.
 
         This is a private method and should not be called outside of this class.
         """
-        async with aiohttp.ClientSession() as session, session.get(
-            "https://api.scryfall.com/cards/random",
-        ) as req:
+        async with aiohttp.ClientSession() as session:
+            req = await self.bot.http_cache.get(
+                session,
+                f"{self.SCRYFALL_API_URL}/cards/random",
+                store=False,
+            )
             if req.status == self.REQ_SUCCESS:
-                card = await req.json()
+                card = req.json()
                 self.daily_card_name = card["name"]
                 self.daily_card_image_uri = card["image_uris"]["png"]
                 self.daily_card_type = card["type_line"]
@@ -56,24 +89,67 @@ class MagicTCG(commands.Cog):
                 self.daily_card_prices_usd = card["prices"]["usd"]
                 self.daily_card_prices_tix = card["prices"]["tix"]
 
+    async def __get_magic_card_names(self) -> list[str] | None:
+        """Get every Magic: The Gathering card name from the Scryfall API.
+
+        This is a private method and should not be called outside of this class.
+        """
+        async with aiohttp.ClientSession() as session:
+            req = await self.bot.http_cache.get(
+                session,
+                f"{self.SCRYFALL_API_URL}/catalog/card-names",
+            )
+            if req.status == self.REQ_SUCCESS:
+                return await self.bot.card_work.run(parse_magic_card_names, req.body)
+
+            return None
+
+    def __match_card_name(self, card_name: str) -> list[CardNameMatch]:
+        """Get the closest known card names, best match first.
+
+        Returns an empty list while the card name index is still being built.
+        This is a private method and should not be called outside of this class.
+        """
+        if self.card_name_matcher is None:
+            return []
+
+        return self.card_name_matcher.lookup(card_name)
+
     async def __get_named_magic_card(self, card_name: str) -> dict | None:
         """Get one or more searched named cards from the Scryfall API.
 
+        Found cards are trimmed to the displayed fields and kept in the card
+        cache, which may be shared with other bot processes.
         This is a private method and should not be called outside of this class.
         """
-        async with aiohttp.ClientSession() as session, session.get(
-            f"https://api.scryfall.com/cards/named?exact={card_name}",
-        ) as req_exact:
+        cache_key = (
+            f"magic:named:v{CARD_RECORD_VERSION}:{normalize_card_name(card_name)}"
+        )
+        card = load_magic_card(await self.bot.card_cache.get(cache_key))
+        if card is not None:
+            return card
+
+        query_safe_card_name = urllib.parse.quote_plus(card_name)
+        async with aiohttp.ClientSession() as session:
+            req_exact = await self.bot.http_cache.get(
+                session,
+                f"{self.SCRYFALL_API_URL}/cards/named?exact={query_safe_card_name}",
+            )
             if req_exact.status == self.REQ_SUCCESS:
-                return await req_exact.json()
+                card = trim_magic_card(req_exact.json())
+                await self.bot.card_cache.set(cache_key, card)
+                return card
 
-            async with session.get(
-                f"https://api.scryfall.com/cards/named?fuzzy={card_name}",
-            ) as req_fuzzy:
-                if req_fuzzy.status == self.REQ_SUCCESS:
-                    return await req_fuzzy.json()
+            req_fuzzy = await self.bot.http_cache.get(
+                session,
+                f"{self.SCRYFALL_API_URL}/cards/named?fuzzy={query_safe_card_name}",
+            )
+            if req_fuzzy.status == self.REQ_SUCCESS:
+                card = trim_magic_card(req_fuzzy.json())
+                await self.bot.card_cache.set(cache_key, card)
+                return card
 
-                return None
+            return None
 
     async def __get_queried_magic_card(self, card_name: str) -> list[dict] | None:
         """Get one or more queried cards from the Scryfall API.
@@ -81,15 +157,71 @@ class MagicTCG(commands.Cog):
         This is a private method and should not be called outside of this class.
         """
         query_safe_card_name = urllib.parse.quote_plus(card_name)
-        async with aiohttp.ClientSession() as session, session.get(
-            f"https://api.scryfall.com/cards/search?q={query_safe_card_name}",
-        ) as req:
+        async with aiohttp.ClientSession() as session:
+            req = await self.bot.http_cache.get(
+                session,
+                f"{self.SCRYFALL_API_URL}/cards/search?q={query_safe_card_name}",
+            )
             if req.status == self.REQ_SUCCESS:
-                card = await req.json()
-                return card["data"]
+                return await self.bot.card_work.run(parse_magic_cards, req.body)
 
             return None
 
+    async def __get_magic_card_prices(
+        self,
+        card_ids: list[str],
+    ) -> dict[str, float | None]:
+        """Get the USD prices of cards by id from the Scryfall API.
+
+        Cards are fetched PRICE_BATCH_SIZE at a time from /cards/collection,
+        pausing between batches to stay under Scryfall's rate limit. Cards of a
+        failed batch are left out.
+        This is a private method and should not be called outside of this class.
+        """
+        prices = {}
+        async with aiohttp.ClientSession() as session:
+            for start in range(0, len(card_ids), self.PRICE_BATCH_SIZE):
+                batch = card_ids[start : start + self.PRICE_BATCH_SIZE]
+                async with session.post(
+                    f"{self.SCRYFALL_API_URL}/cards/collection",
+                    json={"identifiers": [{"id": card_id} for card_id in batch]},
+                ) as req:
+                    if req.status == self.REQ_SUCCESS:
+                        prices.update(
+                            await self.bot.card_work.run(
+                                parse_magic_card_prices,
+                                await req.read(),
+                            ),
+                        )
+                await asyncio.sleep(self.PRICE_BATCH_DELAY)
+
+        return prices
+
+    async def __send_price_alerts(self, alerts: list[PriceAlert]) -> None:
+        """Send price alerts to the channels they were set up in.
+
+        A channel that can't be sent to, e.g. for lack of permissions, is skipped
+        so the other channels still get their alerts.
+        This is a private method and should not be called outside of this class.
+        """
+        alert_lines = {}
+        for alert in alerts:
+            alert_lines.setdefault(alert.watch.channel_id, []).append(alert.describe())
+
+        for channel_id, lines in alert_lines.items():
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+
+            try:
+                for start in range(0, len(lines), self.ALERTS_PER_MESSAGE):
+                    await channel.send(
+                        "Magic: The Gathering price alert!\n"
+                        + "\n".join(lines[start : start + self.ALERTS_PER_MESSAGE]),
+                    )
+            except discord.HTTPException as exc:
+                print(f"Could not send price alerts to channel {channel_id}: {exc}")  # noqa: T201
+
     def __build_daily_embed(self) -> None:
         """Build an embed with the card information.
 
@@ -176,6 +308,75 @@ class MagicTCG(commands.Cog):
         embed.set_footer(text=self.EMBED_FOOTER)
         return embed
 
+    def __build_card_embeds(self, card: dict) -> list[discord.Embed]:
+        """Build the embeds of a card, one per face for double-faced cards.
+
+        This is a private method and should not be called outside of this class.
+        """
+        if "card_faces" not in card:
+            return [self.__build_single_faced_card_embed(card)]
+
+        double_faced_card_embed = self.__build_double_faced_card_embed(card)
+        front_face = double_faced_card_embed["front"]
+        back_face = double_faced_card_embed["back"]
+        if card["layout"] == "adventure":
+            front_face.set_image(url=card["image_uris"]["png"])
+            back_face.set_image(url=card["image_uris"]["png"])
+        else:
+            front_face.set_image(url=card["card_faces"][0]["image_uris"]["png"])
+            back_face.set_image(url=card["card_faces"][1]["image_uris"]["png"])
+        return [front_face, back_face]
+
+    async def lookup_named_card(
+        self,
+        card_name: str,
+    ) -> tuple[str, list[discord.Embed]] | None:
+        """Get the name and embeds of the card best matching a card name.
+
+        This is the lookup behind `/magicnamedsearch`, for use by other cogs.
+        """
+        matches = self.__match_card_name(card_name)
+        card = await self.__get_named_magic_card(
+            matches[0].name if matches else card_name,
+        )
+        if card is None:
+            return None
+
+        with phase("render"):
+            return card["name"], self.__build_card_embeds(card)
+
+    @tasks.loop(hours=CARD_NAME_INDEX_REFRESH_HOURS)
+    async def refresh_card_name_index(self) -> None:
+        """Rebuild the offline card name index used to resolve misspelled names.
+
+        When the card names can't be fetched, the rebuild is retried every
+        CARD_NAME_INDEX_RETRY_MINUTES instead of on the next daily refresh.
+        """
+        card_names = await self.__get_magic_card_names()
+        if card_names is None:
+            self.refresh_card_name_index.change_interval(
+                minutes=self.CARD_NAME_INDEX_RETRY_MINUTES,
+            )
+            return
+
+        self.card_name_matcher = await asyncio.to_thread(
+            CardNameMatcher,
+            card_names,
+        )
+        self.refresh_card_name_index.change_interval(
+            hours=self.CARD_NAME_INDEX_REFRESH_HOURS,
+        )
+
+    @tasks.loop(minutes=30)
+    async def refresh_watched_prices(self) -> None:
+        """Refresh the prices of every watched card and send the alerts that fired."""
+        card_ids = self.price_watch.card_ids
+        if not card_ids:
+            return
+
+        prices = await self.__get_magic_card_prices(card_ids)
+        await self.__send_price_alerts(self.price_watch.apply_prices(prices))
+
     @tasks.loop(seconds=1)
     async def send_daily_magic_card(self) -> None:
         """Send the daily Magic: The Gathering card of the day to the channel."""
@@ -352,32 +553,34 @@ class MagicTCG(commands.Cog):
             "Enter the name of the Magic: The Gathering card you're searching for",
         ),
     ) -> None:
-        """Search for named Magic: The Gathering cards."""
-        card = await self.__get_named_magic_card(query)
-        embeds = []
+        """Search for named Magic: The Gathering cards.
+
+        Misspelled names are resolved with the offline card name index first, so
+        the upstream fuzzy search is only needed when the index has no match.
+        """
+        matches = self.__match_card_name(query)
+        card = await self.__get_named_magic_card(
+            matches[0].name if matches else query,
+        )
 
         if card is None:
             await ctx.respond(f"Query `{query}` is not found.")
             return
 
-        await ctx.respond(f"Returning named search result for query `{query}`")
-        if "card_faces" in card:
-            double_faced_card_embed = self.__build_double_faced_card_embed(card)
-            front_face = double_faced_card_embed["front"]
-            back_face = double_faced_card_embed["back"]
-            if card["layout"] == "adventure":
-                front_face.set_image(url=card["image_uris"]["png"])
-                back_face.set_image(url=card["image_uris"]["png"])
+        with phase("send"):
+            if len(matches) > 1:
+                alternatives = ", ".join(f"`{match.name}`" for match in matches[1:])
+                await ctx.respond(
+                    f"Returning named search result for query `{query}` (closest match: `{matches[0].name}`)\nOther matches: {alternatives}",  # noqa: E501
+                )
             else:
-                front_face.set_image(url=card["card_faces"][0]["image_uris"]["png"])
-                back_face.set_image(url=card["card_faces"][1]["image_uris"]["png"])
-            embeds.append(front_face)
-            embeds.append(back_face)
-        else:
-            embeds.append(self.__build_single_faced_card_embed(card))
+                await ctx.respond(f"Returning named search result for query `{query}`")
+
+        with phase("render"):
+            paginator = Paginator(pages=self.__build_card_embeds(card))
 
-        paginator = Paginator(pages=embeds)
-        await paginator.respond(ctx.interaction, ephemeral=True)
+        with phase("send"):
+            await paginator.respond(ctx.interaction, ephemeral=True)
 
     @discord.slash_command(
         name="magicquerysearch",
@@ -399,25 +602,125 @@ class MagicTCG(commands.Cog):
             await ctx.respond(f"Query `{query}` is not found.")
             return
 
-        await ctx.respond(f"Returning query search result for query `{query}`")
-        for card in data:
-            if "card_faces" in card:
-                double_faced_card_embed = self.__build_double_faced_card_embed(card)
-                front_face = double_faced_card_embed["front"]
-                back_face = double_faced_card_embed["back"]
-                if card["layout"] == "adventure":
-                    front_face.set_image(url=card["image_uris"]["png"])
-                    back_face.set_image(url=card["image_uris"]["png"])
-                else:
-                    front_face.set_image(url=card["card_faces"][0]["image_uris"]["png"])
-                    back_face.set_image(url=card["card_faces"][1]["image_uris"]["png"])
-                embeds.append(front_face)
-                embeds.append(back_face)
-            else:
-                embeds.append(self.__build_single_faced_card_embed(card))
+        with phase("send"):
+            await ctx.respond(f"Returning query search result for query `{query}`")
+
+        with phase("render"):
+            for number, card in enumerate(data, start=1):
+                embeds.extend(self.__build_card_embeds(card))
+                if number % self.EMBEDS_PER_YIELD == 0:
+                    await asyncio.sleep(0)
+
+            paginator = Paginator(pages=embeds)
+
+        with phase("send"):
+            await paginator.respond(ctx.interaction, ephemeral=True)
+
+    @discord.slash_command(
+        name="magicwatch",
+        description="Get alerted in this channel when a Magic: The Gathering card's price moves",  # noqa: E501
+    )
+    async def watch(
+        self,
+        ctx: discord.ApplicationContext,
+        card: str = Option(
+            str,
+            "Enter the name of the Magic: The Gathering card to watch",
+        ),
+        price: float = Option(
+            float,
+            "Alert when the price (USD) crosses this value",
+            required=False,
+            default=None,
+        ),
+        percent: float = Option(
+            float,
+            "Alert when the price moves by this percentage (default 10)",
+            required=False,
+            default=None,
+        ),
+    ) -> None:
+        """Watch a Magic: The Gathering card's price."""
+        matches = self.__match_card_name(card)
+        found = await self.__get_named_magic_card(
+            matches[0].name if matches else card,
+        )
+
+        if found is None:
+            await ctx.respond(f"Card `{card}` is not found.")
+            return
+
+        if price is None and percent is None:
+            percent = self.DEFAULT_WATCH_PERCENT
+
+        current_price = parse_price(found["prices"]["usd"])
+        watch = PriceWatch(
+            ctx.author.id,
+            ctx.channel_id,
+            found["id"],
+            found["name"],
+            price,
+            percent,
+        )
+        if not self.price_watch.add(watch, current_price):
+            await ctx.respond(
+                f"You can watch at most {PriceWatchList.MAX_WATCHES_PER_USER} Magic: The Gathering cards. Use `/magicunwatch` to remove one first.",  # noqa: E501
+            )
+            return
+
+        watched_price = self.price_watch.get_price(watch.card_id)
+        conditions = []
+        if price is not None:
+            conditions.append(f"crosses {price:.2f}$")
+        if percent is not None:
+            conditions.append(f"moves by {percent:g}%")
+        await ctx.respond(
+            f"Watching `{found['name']}` (currently {watched_price or 0}$), you will be alerted in this channel when its price {' or '.join(conditions)}.",  # noqa: E501
+        )
+
+    @discord.slash_command(
+        name="magicunwatch",
+        description="Stop watching a Magic: The Gathering card's price",
+    )
+    async def unwatch(
+        self,
+        ctx: discord.ApplicationContext,
+        card: str = Option(
+            str,
+            "Enter the name of the Magic: The Gathering card to stop watching",
+        ),
+    ) -> None:
+        """Stop watching a Magic: The Gathering card's price."""
+        watch = self.price_watch.remove(ctx.author.id, card)
+        if watch is None:
+            await ctx.respond(f"You are not watching `{card}`.")
+            return
 
-        paginator = Paginator(pages=embeds)
-        await paginator.respond(ctx.interaction, ephemeral=True)
+        await ctx.respond(f"Stopped watching `{watch.card_name}`.")
+
+    @discord.slash_command(
+        name="magicwatchlist",
+        description="List the Magic: The Gathering cards whose price you are watching",
+    )
+    async def watchlist(self, ctx: discord.ApplicationContext) -> None:
+        """List the user's watched Magic: The Gathering cards."""
+        watches = self.price_watch.get_user_watches(ctx.author.id)
+        if not watches:
+            await ctx.respond(
+                "You are not watching any Magic: The Gathering cards. Use `/magicwatch` to watch one.",  # noqa: E501
+            )
+            return
+
+        embed = discord.Embed(
+            title="Your Magic: The Gathering watchlist",
+            description="\n".join(
+                f"`{watch.card_name}`: {self.price_watch.get_price(watch.card_id) or 0}$"  # noqa: E501
+                for watch in watches
+            ),
+            color=discord.Color.blurple(),
+        )
+        embed.set_footer(text=self.EMBED_FOOTER)
+        await ctx.respond(embed=embed, ephemeral=True)
 
 
 def setup(bot: discord.Bot) -> None:
@@ -0,0 +1,97 @@
+"""TheCardGuardian Diagnostics Cog."""
+
+import discord
+from discord.ext import commands
+
+
+class TheCardGuardianDiagnostics(commands.Cog):
+    """TheCardGuardian Diagnostics Cog."""
+
+    EMBED_FIELD_LIMIT = 1024
+
+    def __init__(self, bot: discord.Bot) -> None:
+        """Initialize the TheCardGuardianDiagnostics cog."""
+        self.bot = bot
+
+    def __truncate(self, text: str) -> str:
+        """Truncate text to fit in an embed field.
+
+        This is a private method and should not be called outside of this class.
+        """
+        if len(text) <= self.EMBED_FIELD_LIMIT:
+            return text
+
+        return text[: self.EMBED_FIELD_LIMIT - 3] + "..."
+
+    @discord.slash_command(
+        name="diagnostics",
+        description="Show TheCardGuardian's event loop lag and slowest recent commands",
+        default_member_permissions=discord.Permissions(administrator=True),
+    )
+    async def diagnostics(self, ctx: discord.ApplicationContext) -> None:
+        """Show the event loop lag and the slowest recent commands, for the owner only.
+
+        The report covers every server the bot is in, so it is restricted to the
+        bot's owner. The administrator permission only hides the command from
+        other members.
+        """
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.respond(
+                "Only TheCardGuardian's owner can see its diagnostics.",
+                ephemeral=True,
+            )
+            return
+
+        diagnostics = self.bot.diagnostics
+        if not diagnostics.enabled:
+            await ctx.respond(
+                "Diagnostics are disabled. Set `DIAGNOSTICS=1` in the bot's environment to enable them.",  # noqa: E501
+                ephemeral=True,
+            )
+            return
+
+        embed = discord.Embed(
+            title="TheCardGuardian Diagnostics",
+            description=self.__truncate(diagnostics.report()),
+            color=discord.Color.blurple(),
+        )
+        embed.add_field(name="HTTP Cache", value=self.bot.http_cache.report())
+        embed.add_field(name="Card Cache", value=self.bot.card_cache.report())
+        embed.add_field(
+            name="Admission Control",
+            value=self.__truncate(self.bot.admission.report()),
+            inline=False,
+        )
+        if self.bot.startup_time is not None:
+            embed.add_field(
+                name="Startup",
+                value=f"Ready {self.bot.startup_time:.2f}s after launch, slash commands {self.bot.command_sync}",  # noqa: E501
+            )
+
+        for trace in diagnostics.get_slowest_commands():
+            if trace.profile:
+                embed.add_field(
+                    name=f"Profile of {trace.name} ({trace.duration * 1000:.0f} ms)",
+                    value=self.__truncate(
+                        "\n".join(
+                            f"`{count}` {frame}" for frame, count in trace.profile
+                        ),
+                    ),
+                    inline=False,
+                )
+                break
+
+        if diagnostics.slow_callbacks:
+            stalled_for, stack = diagnostics.slow_callbacks[-1]
+            embed.add_field(
+                name=f"Last event loop stall ({stalled_for * 1000:.0f} ms)",
+                value=self.__truncate(f"```{stack}```"),
+                inline=False,
+            )
+
+        await ctx.respond(embed=embed, ephemeral=True)
+
+
+def setup(bot: discord.Bot) -> None:
+    """Set up the TheCardGuardianDiagnostics cog."""
+    bot.add_cog(TheCardGuardianDiagnostics(bot))
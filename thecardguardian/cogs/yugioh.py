@@ -2,13 +2,31 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
+import urllib.parse
 
 import aiohttp
 import discord
 from discord.commands import Option
 from discord.ext import commands, tasks
 from discord.ext.pages import Paginator
+from utils.card_name_matcher import (
+    CardNameMatch,
+    CardNameMatcher,
+    normalize_card_name,
+)
+from utils.card_records import (
+    CARD_RECORD_VERSION,
+    YugiohCardRecord,
+    load_yugioh_cards,
+    parse_price,
+    parse_yugioh_card_names,
+    parse_yugioh_card_prices,
+    parse_yugioh_cards,
+)
+from utils.diagnostics import phase
+from utils.price_watch import PriceAlert, PriceWatch, PriceWatchList
 
 
 class Yugioh(commands.Cog):
@@ -26,29 +44,45 @@ class Yugioh(commands.Cog):
 
     first_run = True
 
+    card_name_matcher = None
+
     DATE_FORMAT = "%d %B %Y"
+    YGOPRODECK_API_URL = "https://db.ygoprodeck.com/api/v7"
     REQ_SUCCESS = 200
     EMBED_FOOTER = "TheCardGuardian\nTheCardGuardian is not affiliated with Scryfall or YGOPRODeck or DigimonCard.io or Magic: The Gathering or Yu-Gi-Oh! or Digimon Card Game.\nAll rights goes to their respective owners."  # noqa: E501
     REQ_NOT_FOUND = 404
     PROPER_SPLITTED_TIME_LENGTH = 2
     MAX_HOUR = 23
     MAX_SECOND = 59
+    EMBEDS_PER_YIELD = 100
+    PRICE_BATCH_SIZE = 50
+    PRICE_BATCH_DELAY = 0.1
+    DEFAULT_WATCH_PERCENT = 10.0
+    ALERTS_PER_MESSAGE = 20
+    CARD_NAME_INDEX_REFRESH_HOURS = 24
+    CARD_NAME_INDEX_RETRY_MINUTES = 5
 
     def __init__(self, bot: discord.Bot) -> None:
         """Initialize the Yugioh cog."""
         self.bot = bot
+        self.price_watch = PriceWatchList("Yu-Gi-Oh!")
         self.send_daily_yugioh_card.start()
+        self.refresh_card_name_index.start()
+        self.refresh_watched_prices.start()
 
     async def __get_and_set_random_yugioh_card(self) -> None:
         """Get a random card from the YGOPRODECK API.
 
         This is a private method and should not be called outside of this class.
         """
-        async with aiohttp.ClientSession() as session, session.get(
-            "https://db.ygoprodeck.com/api/v7/randomcard.php",
-        ) as req:
+        async with aiohttp.ClientSession() as session:
+            req = await self.bot.http_cache.get(
+                session,
+                f"{self.YGOPRODECK_API_URL}/randomcard.php",
+                store=False,
+            )
             if req.status == self.REQ_SUCCESS:
-                card = await req.json()
+                card = req.json()
                 self.daily_card_name = card["data"][0]["name"]
                 self.daily_card_image_uri = card["data"][0]["card_images"][0][
                     "image_url"
@@ -59,6 +93,62 @@ class Yugioh(commands.Cog):
                     "tcgplayer_price"
                 ]
 
+    async def __get_yugioh_card_prices(
+        self,
+        card_ids: list[str],
+    ) -> dict[str, float | None]:
+        """Get the USD prices of cards by id from the YGOPRODECK API.
+
+        Cards are fetched PRICE_BATCH_SIZE at a time with a multi-id cardinfo
+        request, pausing between batches to stay under YGOPRODECK's rate limit.
+        Cards of a failed batch are left out.
+        This is a private method and should not be called outside of this class.
+        """
+        prices = {}
+        async with aiohttp.ClientSession() as session:
+            for start in range(0, len(card_ids), self.PRICE_BATCH_SIZE):
+                batch = card_ids[start : start + self.PRICE_BATCH_SIZE]
+                req = await self.bot.http_cache.get(
+                    session,
+                    f"{self.YGOPRODECK_API_URL}/cardinfo.php?id={','.join(batch)}",
+                    store=False,
+                )
+                if req.status == self.REQ_SUCCESS:
+                    prices.update(
+                        await self.bot.card_work.run(
+                            parse_yugioh_card_prices,
+                            req.body,
+                        ),
+                    )
+                await asyncio.sleep(self.PRICE_BATCH_DELAY)
+
+        return prices
+
+    async def __send_price_alerts(self, alerts: list[PriceAlert]) -> None:
+        """Send price alerts to the channels they were set up in.
+
+        A channel that can't be sent to, e.g. for lack of permissions, is skipped
+        so the other channels still get their alerts.
+        This is a private method and should not be called outside of this class.
+        """
+        alert_lines = {}
+        for alert in alerts:
+            alert_lines.setdefault(alert.watch.channel_id, []).append(alert.describe())
+
+        for channel_id, lines in alert_lines.items():
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+
+            try:
+                for start in range(0, len(lines), self.ALERTS_PER_MESSAGE):
+                    await channel.send(
+                        "Yu-Gi-Oh! price alert!\n"
+                        + "\n".join(lines[start : start + self.ALERTS_PER_MESSAGE]),
+                    )
+            except discord.HTTPException as exc:
+                print(f"Could not send price alerts to channel {channel_id}: {exc}")  # noqa: T201
+
     def __build_daily_embed(self) -> None:
         """Build an embed with the card information.
 
@@ -80,68 +170,163 @@ class Yugioh(commands.Cog):
         embed.set_footer(text=self.EMBED_FOOTER)
         return embed
 
-    async def __get_named_yugioh_card(self, card_name: str) -> dict | None:
-        """Get one or more searched named cards from the YGOPRODECK API.
+    async def __get_yugioh_card_names(self) -> list[str] | None:
+        """Get every Yu-Gi-Oh! card name from the YGOPRODECK API.
+
+        This is a private method and should not be called outside of this class.
+        """
+        async with aiohttp.ClientSession() as session:
+            req = await self.bot.http_cache.get(
+                session,
+                f"{self.YGOPRODECK_API_URL}/cardinfo.php",
+            )
+            if req.status == self.REQ_SUCCESS:
+                return await self.bot.card_work.run(parse_yugioh_card_names, req.body)
 
+            return None
+
+    def __match_card_name(self, card_name: str) -> list[CardNameMatch]:
+        """Get the closest known card names, best match first.
+
+        Returns an empty list while the card name index is still being built.
         This is a private method and should not be called outside of this class.
         """
-        async with aiohttp.ClientSession() as session, session.get(
-            f"https://db.ygoprodeck.com/api/v7/cardinfo.php?name={card_name}",
-        ) as req_exact:
+        if self.card_name_matcher is None:
+            return []
+
+        return self.card_name_matcher.lookup(card_name)
+
+    async def __get_named_yugioh_card(
+        self,
+        card_name: str,
+    ) -> list[YugiohCardRecord] | None:
+        """Get the named card from the YGOPRODECK API, as a one-card list.
+
+        Only the first card of a fuzzy search is kept, in the card cache, which
+        may be shared with other bot processes.
+        This is a private method and should not be called outside of this class.
+        """
+        cache_key = (
+            f"yugioh:named:v{CARD_RECORD_VERSION}:{normalize_card_name(card_name)}"
+        )
+        cards = load_yugioh_cards(await self.bot.card_cache.get(cache_key))
+        if cards:
+            return cards
+
+        query_safe_card_name = urllib.parse.quote_plus(card_name)
+        async with aiohttp.ClientSession() as session:
+            req_exact = await self.bot.http_cache.get(
+                session,
+                f"{self.YGOPRODECK_API_URL}/cardinfo.php?name={query_safe_card_name}",
+            )
             if req_exact.status == self.REQ_SUCCESS:
-                return await req_exact.json()
+                cards = await self.bot.card_work.run(parse_yugioh_cards, req_exact.body)
+                await self.bot.card_cache.set(cache_key, cards[:1])
+                return cards[:1]
 
-            async with session.get(
-                f"https://db.ygoprodeck.com/api/v7/cardinfo.php?fname={card_name}",
-            ) as req_fuzzy:
-                if req_fuzzy.status == self.REQ_SUCCESS:
-                    return await req_fuzzy.json()
+            req_fuzzy = await self.bot.http_cache.get(
+                session,
+                f"{self.YGOPRODECK_API_URL}/cardinfo.php?fname={query_safe_card_name}",
+            )
+            if req_fuzzy.status == self.REQ_SUCCESS:
+                cards = await self.bot.card_work.run(parse_yugioh_cards, req_fuzzy.body)
+                await self.bot.card_cache.set(cache_key, cards[:1])
+                return cards[:1]
 
-                return None
+            return None
 
-    async def __get_queried_yugioh_card(self, card_name: str) -> dict | None:
+    async def __get_queried_yugioh_card(
+        self,
+        card_name: str,
+    ) -> list[YugiohCardRecord] | None:
         """Get one or more searched named cards from the YGOPRODECK API.
 
         This is a private method and should not be called outside of this class.
         """
-        async with aiohttp.ClientSession() as session, session.get(
-            f"https://db.ygoprodeck.com/api/v7/cardinfo.php?fname={card_name}",
-        ) as req:
+        async with aiohttp.ClientSession() as session:
+            req = await self.bot.http_cache.get(
+                session,
+                f"{self.YGOPRODECK_API_URL}/cardinfo.php?fname={card_name}",
+            )
             if req.status == self.REQ_SUCCESS:
-                return await req.json()
+                return await self.bot.card_work.run(parse_yugioh_cards, req.body)
 
             return None
 
-    def __build_card_embed(
-        self,
-        card: dict,
-        data_number: int = 0,
-    ) -> discord.Embed:
+    def __build_card_embed(self, card: YugiohCardRecord) -> discord.Embed:
         """Build card embed with the related card information.
 
         This is a private method and should not be called outside of this class.
         """
-        price = card["data"][data_number]["card_prices"][0]["tcgplayer_price"]
+        price = card.price
 
         if price is None:
             price = 0
 
         embed = discord.Embed(
-            title=f"{card["data"][data_number]["name"]}",
-            description=f"{card["data"][data_number]["type"]}",
+            title=f"{card.name}",
+            description=f"{card.type}",
             color=discord.Color.blurple(),
         )
         embed.add_field(
             name=f"Price (USD): {price}$",
-            value=f"**{card["data"][data_number]["desc"]}**",
+            value=f"**{card.desc}**",
             inline=True,
         )
-        embed.set_image(
-            url=card["data"][data_number]["card_images"][0]["image_url"],
-        )
+        embed.set_image(url=card.image_url)
         embed.set_footer(text=self.EMBED_FOOTER)
         return embed
 
+    async def lookup_named_card(
+        self,
+        card_name: str,
+    ) -> tuple[str, list[discord.Embed]] | None:
+        """Get the name and embeds of the card best matching a card name.
+
+        This is the lookup behind `/yugiohnamedsearch`, for use by other cogs.
+        """
+        matches = self.__match_card_name(card_name)
+        cards = await self.__get_named_yugioh_card(
+            matches[0].name if matches else card_name,
+        )
+        if cards is None:
+            return None
+
+        with phase("render"):
+            return cards[0].name, [self.__build_card_embed(cards[0])]
+
+    @tasks.loop(hours=CARD_NAME_INDEX_REFRESH_HOURS)
+    async def refresh_card_name_index(self) -> None:
+        """Rebuild the offline card name index used to resolve misspelled names.
+
+        When the card names can't be fetched, the rebuild is retried every
+        CARD_NAME_INDEX_RETRY_MINUTES instead of on the next daily refresh.
+        """
+        card_names = await self.__get_yugioh_card_names()
+        if card_names is None:
+            self.refresh_card_name_index.change_interval(
+                minutes=self.CARD_NAME_INDEX_RETRY_MINUTES,
+            )
+            return
+
+        self.card_name_matcher = await asyncio.to_thread(
+            CardNameMatcher,
+            card_names,
+        )
+        self.refresh_card_name_index.change_interval(
+            hours=self.CARD_NAME_INDEX_REFRESH_HOURS,
+        )
+
+    @tasks.loop(minutes=30)
+    async def refresh_watched_prices(self) -> None:
+        """Refresh the prices of every watched card and send the alerts that fired."""
+        card_ids = self.price_watch.card_ids
+        if not card_ids:
+            return
+
+        prices = await self.__get_yugioh_card_prices(card_ids)
+        await self.__send_price_alerts(self.price_watch.apply_prices(prices))
+
     @tasks.loop(seconds=1)
     async def send_daily_yugioh_card(self) -> None:
         """Send the daily card of the day to the channel."""
@@ -321,19 +506,36 @@ class Yugioh(commands.Cog):
             "Enter the name of the Yu-Gi-Oh! card you're searching for",
         ),
     ) -> None:
-        """Search for named Yu-Gi-Oh! cards."""
-        card = await self.__get_named_yugioh_card(query)
+        """Search for named Yu-Gi-Oh! cards.
+
+        Misspelled names are resolved with the offline card name index first, so
+        the upstream fuzzy search is only needed when the index has no match.
+        """
+        matches = self.__match_card_name(query)
+        cards = await self.__get_named_yugioh_card(
+            matches[0].name if matches else query,
+        )
         embeds = []
 
-        if card is None:
+        if cards is None:
             await ctx.respond(f"Query `{query}` is not found.")
             return
 
-        await ctx.respond(f"Returning named search result for query `{query}`")
-        embeds.append(self.__build_card_embed(card))
+        with phase("send"):
+            if len(matches) > 1:
+                alternatives = ", ".join(f"`{match.name}`" for match in matches[1:])
+                await ctx.respond(
+                    f"Returning named search result for query `{query}` (closest match: `{matches[0].name}`)\nOther matches: {alternatives}",  # noqa: E501
+                )
+            else:
+                await ctx.respond(f"Returning named search result for query `{query}`")
 
-        paginator = Paginator(pages=embeds)
-        await paginator.respond(ctx.interaction, ephemeral=True)
+        with phase("render"):
+            embeds.append(self.__build_card_embed(cards[0]))
+            paginator = Paginator(pages=embeds)
+
+        with phase("send"):
+            await paginator.respond(ctx.interaction, ephemeral=True)
 
     @discord.slash_command(
         name="yugiohquerysearch",
@@ -351,16 +553,129 @@ class Yugioh(commands.Cog):
         cards = await self.__get_queried_yugioh_card(query)
         embeds = []
 
-        """ if cards["data"] is None:
+        if cards is None:
             await ctx.respond(f"Query `{query}` is not found.")
-        return """
+            return
+
+        with phase("send"):
+            await ctx.respond(f"Returning named search result for query `{query}`")
+
+        with phase("render"):
+            for number, card in enumerate(cards, start=1):
+                embeds.append(self.__build_card_embed(card))
+                if number % self.EMBEDS_PER_YIELD == 0:
+                    await asyncio.sleep(0)
+
+            paginator = Paginator(pages=embeds)
+
+        with phase("send"):
+            await paginator.respond(ctx.interaction, ephemeral=True)
+
+    @discord.slash_command(
+        name="yugiohwatch",
+        description="Get alerted in this channel when a Yu-Gi-Oh! card's price moves",
+    )
+    async def watch(
+        self,
+        ctx: discord.ApplicationContext,
+        card: str = Option(
+            str,
+            "Enter the name of the Yu-Gi-Oh! card to watch",
+        ),
+        price: float = Option(
+            float,
+            "Alert when the price (USD) crosses this value",
+            required=False,
+            default=None,
+        ),
+        percent: float = Option(
+            float,
+            "Alert when the price moves by this percentage (default 10)",
+            required=False,
+            default=None,
+        ),
+    ) -> None:
+        """Watch a Yu-Gi-Oh! card's price."""
+        matches = self.__match_card_name(card)
+        cards = await self.__get_named_yugioh_card(
+            matches[0].name if matches else card,
+        )
+
+        if cards is None:
+            await ctx.respond(f"Card `{card}` is not found.")
+            return
+
+        if price is None and percent is None:
+            percent = self.DEFAULT_WATCH_PERCENT
+
+        current_price = parse_price(cards[0].price)
+        watch = PriceWatch(
+            ctx.author.id,
+            ctx.channel_id,
+            str(cards[0].id),
+            cards[0].name,
+            price,
+            percent,
+        )
+        if not self.price_watch.add(watch, current_price):
+            await ctx.respond(
+                f"You can watch at most {PriceWatchList.MAX_WATCHES_PER_USER} Yu-Gi-Oh! cards. Use `/yugiohunwatch` to remove one first.",  # noqa: E501
+            )
+            return
 
-        await ctx.respond(f"Returning named search result for query `{query}`")
-        for data_number in range(len(cards["data"])):
-            embeds.append(self.__build_card_embed(cards, data_number))  # noqa: PERF401
+        watched_price = self.price_watch.get_price(watch.card_id)
+        conditions = []
+        if price is not None:
+            conditions.append(f"crosses {price:.2f}$")
+        if percent is not None:
+            conditions.append(f"moves by {percent:g}%")
+        await ctx.respond(
+            f"Watching `{cards[0].name}` (currently {watched_price or 0}$), you will be alerted in this channel when its price {' or '.join(conditions)}.",  # noqa: E501
+        )
 
-        paginator = Paginator(pages=embeds)
-        await paginator.respond(ctx.interaction, ephemeral=True)
+    @discord.slash_command(
+        name="yugiohunwatch",
+        description="Stop watching a Yu-Gi-Oh! card's price",
+    )
+    async def unwatch(
+        self,
+        ctx: discord.ApplicationContext,
+        card: str = Option(
+            str,
+            "Enter the name of the Yu-Gi-Oh! card to stop watching",
+        ),
+    ) -> None:
+        """Stop watching a Yu-Gi-Oh! card's price."""
+        watch = self.price_watch.remove(ctx.author.id, card)
+        if watch is None:
+            await ctx.respond(f"You are not watching `{card}`.")
+            return
+
+        await ctx.respond(f"Stopped watching `{watch.card_name}`.")
+
+    @discord.slash_command(
+        name="yugiohwatchlist",
+        description="List the Yu-Gi-Oh! cards whose price you are watching",
+    )
+    async def watchlist(self, ctx: discord.ApplicationContext) -> None:
+        """List the user's watched Yu-Gi-Oh! cards."""
+        watches = self.price_watch.get_user_watches(ctx.author.id)
+        if not watches:
+            await ctx.respond(
+                "You are not watching any Yu-Gi-Oh! cards. Use `/yugiohwatch` to watch one.",  # noqa: E501
+            )
+            return
+
+        embed = discord.Embed(
+            title="Your Yu-Gi-Oh! watchlist",
+            description="\n".join(
+                f"`{watch.card_name}`: {self.price_watch.get_price(watch.card_id) or 0}$"  # noqa: E501
+                for watch in watches
+            ),
+            color=discord.Color.blurple(),
+        )
+        embed.set_footer(text=self.EMBED_FOOTER)
+        await ctx.respond(embed=embed, ephemeral=True)
 
 
 def setup(bot: discord.Bot) -> None:
@@ -0,0 +1 @@
+"""Offline load-replay harness for TheCardGuardian."""
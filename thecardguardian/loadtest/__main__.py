@@ -0,0 +1,432 @@
+"""Replay synthetic slash commands against the real cogs and fake upstreams.
+
+Run from the thecardguardian directory, i.e.
+
+    python -m loadtest --rate 50 --concurrency 20 --commands 2000 --latency 0.08
+
+Everything runs in one process on localhost, so no network access or Discord
+token is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import statistics
+import time
+from collections import Counter
+
+import discord
+from BotModel.thecardguardian import TheCardGuardian
+from loadtest.fake_discord import FakeInteraction
+from loadtest.fake_redis import FakeRedis
+from loadtest.fake_upstream import CARD_NAME_WORDS, FakeUpstream
+
+COMMANDS = {
+    "cardsearch": "named",
+    "magicnamedsearch": "named",
+    "magicquerysearch": "query",
+    "magicwatch": "watch",
+    "yugiohnamedsearch": "named",
+    "yugiohquerysearch": "query",
+    "yugiohwatch": "watch",
+}
+OPTION_NAMES = {"named": "query", "query": "query", "watch": "card"}
+NOISY_GUILD_ID = 0
+NOISY_COMMAND = ("yugiohquerysearch", "Dark")
+INDEX_WARMUP_TIMEOUT = 60
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line options."""
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest",
+        description="Replay synthetic slash commands against TheCardGuardian's cogs.",
+    )
+    parser.add_argument("--rate", type=float, default=20, help="commands per second")
+    parser.add_argument("--concurrency", type=int, default=10, help="max in flight")
+    parser.add_argument("--commands", type=int, default=500, help="commands to send")
+    parser.add_argument(
+        "--mix",
+        default="magicnamedsearch=4,yugiohnamedsearch=4,magicquerysearch=1,yugiohquerysearch=1",
+        help="comma-separated command=weight pairs",
+    )
+    parser.add_argument("--typo-rate", type=float, default=0.3, help="named typo ratio")
+    parser.add_argument(
+        "--noisy-share",
+        type=float,
+        default=0.0,
+        help="share of commands that are one guild spamming a large query search",
+    )
+    parser.add_argument("--guilds", type=int, default=10, help="distinct guilds")
+    parser.add_argument("--users", type=int, default=100, help="distinct users")
+    parser.add_argument("--cards", type=int, default=2000, help="fake card pool size")
+    parser.add_argument("--latency", type=float, default=0.05, help="upstream seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="upstream 503s")
+    parser.add_argument(
+        "--send-latency",
+        type=float,
+        default=0.0,
+        help="seconds each Discord message send takes",
+    )
+    parser.add_argument(
+        "--http-cache",
+        default="",
+        help="HTTP cache directory (disabled when empty)",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=0,
+        help="Cache-Control max-age seconds the fake upstreams send",
+    )
+    parser.add_argument(
+        "--no-validators",
+        action="store_true",
+        help="send no ETag / Last-Modified, so nothing can be revalidated",
+    )
+    parser.add_argument(
+        "--card-cache",
+        choices=("memory", "redis"),
+        default="memory",
+        help="card cache backend, redis uses a local fake Redis server",
+    )
+    parser.add_argument(
+        "--bots",
+        type=int,
+        default=1,
+        help="bot processes to simulate, sharing the card cache when it's redis",
+    )
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="start sending before the card name indexes are built",
+    )
+    parser.add_argument(
+        "--diagnostics",
+        action="store_true",
+        help="trace and profile commands, printing the slowest ones",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="workload random seed")
+    return parser.parse_args()
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parse a command=weight list into a weight per command."""
+    weights = {}
+    for pair in mix.split(","):
+        name, _, weight = pair.partition("=")
+        if name not in COMMANDS:
+            msg = f"unknown command {name!r}, expected one of {', '.join(COMMANDS)}"
+            raise SystemExit(msg)
+        weights[name] = float(weight or 1)
+
+    return weights
+
+
+def add_typo(card_name: str, rng: random.Random) -> str:
+    """Swap, drop or duplicate one character of a card name."""
+    position = rng.randrange(1, len(card_name) - 1)
+    typo = rng.choice(("swap", "drop", "duplicate"))
+    if typo == "swap":
+        return (
+            card_name[: position - 1]
+            + card_name[position]
+            + card_name[position - 1]
+            + card_name[position + 1 :]
+        )
+
+    if typo == "drop":
+        return card_name[:position] + card_name[position + 1 :]
+
+    return card_name[:position] + card_name[position] + card_name[position:]
+
+
+def percentile(latencies: list[float], percent: int) -> float:
+    """Get a percentile of the latencies, in milliseconds."""
+    if len(latencies) == 1:
+        return latencies[0] * 1000
+
+    return statistics.quantiles(latencies, n=100)[percent - 1] * 1000
+
+
+async def wait_for_card_name_indexes(bot: TheCardGuardian) -> None:
+    """Wait until both cogs have built their offline card name index."""
+    deadline = time.monotonic() + INDEX_WARMUP_TIMEOUT
+    cogs = [bot.get_cog("MagicTCG"), bot.get_cog("Yugioh")]
+    while any(cog.card_name_matcher is None for cog in cogs):
+        if time.monotonic() > deadline:
+            msg = "card name indexes were not built in time"
+            raise SystemExit(msg)
+        await asyncio.sleep(0.05)
+
+
+def build_workload(
+    args: argparse.Namespace,
+    card_names: list[str],
+) -> list[tuple[str, str, int, int]]:
+    """Build the (command, query, guild id, user id) sequence to replay."""
+    rng = random.Random(args.seed)  # noqa: S311
+    weights = parse_mix(args.mix)
+    command_names = rng.choices(list(weights), list(weights.values()), k=args.commands)
+
+    workload = []
+    for command_name in command_names:
+        if rng.random() < args.noisy_share:
+            workload.append(
+                (*NOISY_COMMAND, NOISY_GUILD_ID, rng.randint(1, args.users)),
+            )
+            continue
+
+        if COMMANDS[command_name] in {"named", "watch"}:
+            query = rng.choice(card_names)
+            if rng.random() < args.typo_rate:
+                query = add_typo(query, rng)
+        else:
+            query = rng.choice(CARD_NAME_WORDS)
+
+        workload.append(
+            (
+                command_name,
+                query,
+                rng.randint(1, args.guilds),
+                rng.randint(1, args.users),
+            ),
+        )
+
+    return workload
+
+
+async def replay(
+    bots: list[TheCardGuardian],
+    args: argparse.Namespace,
+    workload: list[tuple[str, str, int, int]],
+    errors: Counter,
+) -> tuple[list[tuple[int, float]], float, int]:
+    """Send the workload at the configured rate and concurrency.
+
+    Commands are spread over the bots in turn, like guilds over shards.
+    Latency is measured from each command's scheduled arrival time, so time
+    spent waiting for a concurrency slot counts against the command. It is
+    returned with the guild id of each command.
+    """
+    commands = [
+        {
+            command.name: command
+            for command in bot.pending_application_commands
+            if command.name in COMMANDS
+        }
+        for bot in bots
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    embeds = 0
+
+    async def run_one(
+        bot_number: int,
+        arrival: float,
+        replayed: tuple[str, str, int, int],
+    ) -> None:
+        nonlocal embeds
+        command_name, query, guild_id, user_id = replayed
+        bot = bots[bot_number]
+        async with semaphore:
+            command = commands[bot_number][command_name]
+            interaction = FakeInteraction(
+                bot,
+                command,
+                {OPTION_NAMES[COMMANDS[command_name]]: query},
+                guild_id,
+                user_id,
+                send_latency=args.send_latency,
+            )
+            ctx = discord.ApplicationContext(bot, interaction)
+            ctx.command = command
+            try:
+                await bot.invoke_application_command(ctx)
+            except Exception as exc:  # noqa: BLE001
+                errors[type(exc).__name__] += 1
+            latencies.append((guild_id, time.perf_counter() - arrival))
+            embeds += interaction.embeds
+
+    start = time.perf_counter()
+    tasks = []
+    for number, replayed in enumerate(workload):
+        arrival = start + number / args.rate
+        await asyncio.sleep(max(0, arrival - time.perf_counter()))
+        tasks.append(
+            asyncio.create_task(run_one(number % len(bots), arrival, replayed)),
+        )
+
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - start, embeds
+
+
+async def refresh_watched_prices(bots: list[TheCardGuardian]) -> float:
+    """Run one price watch refresh on every bot, returning the seconds it took."""
+    start = time.perf_counter()
+    for bot in bots:
+        await bot.get_cog("MagicTCG").refresh_watched_prices()
+        await bot.get_cog("Yugioh").refresh_watched_prices()
+
+    return time.perf_counter() - start
+
+
+def count_errors(bots: list[TheCardGuardian]) -> Counter:
+    """Register listeners counting command errors, returning the counter."""
+    errors = Counter()
+
+    async def on_application_command_error(
+        _: discord.ApplicationContext,
+        error: discord.DiscordException,
+    ) -> None:
+        original = getattr(error, "original", error)
+        errors[type(original).__name__] += 1
+
+    for bot in bots:
+        bot.add_listener(on_application_command_error)
+    return errors
+
+
+def print_report(  # noqa: PLR0913
+    args: argparse.Namespace,
+    bots: list[TheCardGuardian],
+    *,
+    fake_redis: FakeRedis | None,
+    price_refresh_time: float,
+    upstream_calls: Counter,
+    upstream_errors: int,
+    upstream_not_modified: int,
+    latencies: list[tuple[int, float]],
+    elapsed: float,
+    embeds: int,
+    errors: Counter,
+) -> None:
+    """Print the throughput, latency, upstream and memory figures of a run."""
+    errors = errors.copy()
+    busy = errors.pop("CommandBusy", 0)
+    all_latencies = [latency for _, latency in latencies]
+    lines = [
+        f"commands:        {len(latencies)} ({sum(errors.values())} failed, {busy} busy)",  # noqa: E501
+        f"offered rate:    {args.rate:.1f}/s, concurrency {args.concurrency}",
+        f"throughput:      {len(latencies) / elapsed:.1f} commands/s",
+        f"latency p50:     {percentile(all_latencies, 50):.1f} ms",
+        f"latency p95:     {percentile(all_latencies, 95):.1f} ms",
+        f"latency p99:     {percentile(all_latencies, 99):.1f} ms",
+    ]
+    if args.noisy_share:
+        quiet_latencies = [
+            latency for guild_id, latency in latencies if guild_id != NOISY_GUILD_ID
+        ]
+        lines.extend(
+            [
+                f"  other guilds p50: {percentile(quiet_latencies, 50):.1f} ms",
+                f"  other guilds p95: {percentile(quiet_latencies, 95):.1f} ms",
+                f"  other guilds p99: {percentile(quiet_latencies, 99):.1f} ms",
+            ],
+        )
+    lines += [
+        f"embeds sent:     {embeds}",
+        f"upstream calls:  {sum(upstream_calls.values())} ({upstream_errors} injected failures, {upstream_not_modified} not modified)",  # noqa: E501
+    ]
+    lines.extend(f"  {path}: {count}" for path, count in sorted(upstream_calls.items()))
+    lines.extend(f"  error {name}: {count}" for name, count in errors.most_common())
+    lines.append(f"price refresh:   {price_refresh_time * 1000:.1f} ms")
+    for number, bot in enumerate(bots, start=1):
+        if len(bots) > 1:
+            lines.append(f"bot {number}:")
+        lines.append(bot.http_cache.report())
+        lines.append(bot.card_cache.report())
+        lines.append(bot.card_work.report())
+        lines.append(bot.admission.report())
+        lines.append(bot.get_cog("MagicTCG").price_watch.report())
+        lines.append(bot.get_cog("Yugioh").price_watch.report())
+        if bot.diagnostics.enabled:
+            lines.append(bot.diagnostics.report())
+    if fake_redis is not None:
+        lines.append(fake_redis.report())
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    lines.append(f"peak RSS:        {peak_rss:.1f} MiB (bot, harness and fakes)")
+    print("\n".join(lines))  # noqa: T201
+
+
+def create_bot(base_url: str) -> TheCardGuardian:
+    """Create a bot with the card cogs, pointed at the fake upstreams.
+
+    load_extension executes a fresh copy of each cog module, so the upstream
+    URLs are set on the loaded cogs, before their tasks run.
+    """
+    bot = TheCardGuardian()
+    bot.load_extension("cogs.card_search")
+    bot.load_extension("cogs.magic_tcg")
+    bot.load_extension("cogs.yugioh")
+    magic_tcg = bot.get_cog("MagicTCG")
+    magic_tcg.SCRYFALL_API_URL = f"{base_url}{FakeUpstream.SCRYFALL_PREFIX}"
+    yugioh = bot.get_cog("Yugioh")
+    yugioh.YGOPRODECK_API_URL = f"{base_url}{FakeUpstream.YGOPRODECK_PREFIX}"
+    bot.diagnostics.start()
+    return bot
+
+
+async def main() -> None:
+    """Run one load-replay session and print its report."""
+    args = parse_args()
+    upstream = FakeUpstream(
+        args.cards,
+        args.latency,
+        args.error_rate,
+        args.seed,
+        max_age=args.max_age,
+        validators=not args.no_validators,
+    )
+    base_url = await upstream.start()
+
+    fake_redis = None
+    os.environ["CARD_CACHE_URL"] = ""
+    if args.card_cache == "redis":
+        fake_redis = FakeRedis()
+        os.environ["CARD_CACHE_URL"] = await fake_redis.start()
+
+    os.environ["HTTP_CACHE_DIR"] = args.http_cache
+    if args.diagnostics:
+        os.environ["DIAGNOSTICS"] = os.environ["DIAGNOSTICS_PROFILE"] = "1"
+
+    bots = [create_bot(base_url) for _ in range(args.bots)]
+    errors = count_errors(bots)
+
+    if not args.no_warmup:
+        for bot in bots:
+            await wait_for_card_name_indexes(bot)
+
+    warmup_calls = upstream.calls.copy()
+    warmup_errors = upstream.injected_errors
+    warmup_not_modified = upstream.not_modified
+    workload = build_workload(args, upstream.card_names)
+    latencies, elapsed, embeds = await replay(bots, args, workload, errors)
+    price_refresh_time = await refresh_watched_prices(bots)
+
+    print_report(
+        args,
+        bots,
+        fake_redis=fake_redis,
+        price_refresh_time=price_refresh_time,
+        upstream_calls=upstream.calls - warmup_calls,
+        upstream_errors=upstream.injected_errors - warmup_errors,
+        upstream_not_modified=upstream.not_modified - warmup_not_modified,
+        latencies=latencies,
+        elapsed=elapsed,
+        embeds=embeds,
+        errors=errors,
+    )
+    for bot in bots:
+        await bot.close()
+    await upstream.stop()
+    if fake_redis is not None:
+        await fake_redis.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
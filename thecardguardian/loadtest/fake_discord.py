@@ -0,0 +1,151 @@
+"""Synthetic slash-command interactions that never touch the Discord API."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+from typing import Any
+
+import discord
+
+interaction_ids = itertools.count(1)
+
+
+class FakeUser:
+    """The minimum of a discord.User that the cogs and paginators look at."""
+
+    def __init__(self, user_id: int) -> None:
+        """Initialize the user."""
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+
+
+class FakeInteractionResponse:
+    """Records the initial response instead of sending it to Discord."""
+
+    def __init__(self, interaction: FakeInteraction) -> None:
+        """Initialize the response for an interaction."""
+        self.__interaction = interaction
+        self.__done = False
+
+    def is_done(self) -> bool:
+        """Whether the interaction has been responded to."""
+        return self.__done
+
+    async def send_message(self, *args: Any, **kwargs: Any) -> FakeInteraction:  # noqa: ANN401
+        """Record the initial response message."""
+        if self.__done:
+            raise discord.InteractionResponded(self.__interaction)
+
+        self.__done = True
+        await self.__interaction.record(*args, **kwargs)
+        return self.__interaction
+
+    async def defer(self, *, ephemeral: bool = False, **_: Any) -> None:  # noqa: ANN401
+        """Acknowledge the interaction without a message."""
+        self.__done = True
+        self.__interaction.deferred_ephemeral = ephemeral
+
+
+class FakeWebhookMessage(discord.WebhookMessage):
+    """A sent followup message whose edits are recorded instead of sent.
+
+    The parent constructor is skipped for the same reason as FakeInteraction's.
+    """
+
+    def __init__(self, interaction: FakeInteraction) -> None:
+        """Initialize a message sent through an interaction's followup."""
+        self.id = next(interaction_ids)
+        self.__interaction = interaction
+
+    async def edit(self, *args: Any, **kwargs: Any) -> FakeWebhookMessage:  # noqa: ANN401
+        """Record an edit of the message."""
+        await self.__interaction.record(*args, **kwargs)
+        return self
+
+
+class FakeFollowup:
+    """Records followup messages instead of sending them through a webhook."""
+
+    def __init__(self, interaction: FakeInteraction) -> None:
+        """Initialize the followup webhook for an interaction."""
+        self.__interaction = interaction
+
+    async def send(self, *args: Any, **kwargs: Any) -> FakeWebhookMessage:  # noqa: ANN401
+        """Record a followup message."""
+        await self.__interaction.record(*args, **kwargs)
+        return FakeWebhookMessage(self.__interaction)
+
+
+class FakeInteraction(discord.Interaction):
+    """A slash-command interaction with a recording response and followup.
+
+    The parent constructor is skipped because it expects a gateway payload and
+    a connection state; only the attributes read by TheCardGuardian are set.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        bot: discord.Bot,
+        command: discord.SlashCommand,
+        options: dict[str, Any],
+        guild_id: int,
+        user_id: int,
+        *,
+        send_latency: float = 0.0,
+    ) -> None:
+        """Initialize a synthetic invocation of command with the given options."""
+        self._state = bot._connection  # noqa: SLF001
+        self.id = next(interaction_ids)
+        self.type = discord.InteractionType.application_command
+        self.guild_id = guild_id
+        self.channel_id = guild_id
+        self.user = FakeUser(user_id)
+        self.locale = None
+        self.guild_locale = None
+        self.data = {
+            "id": str(self.id),
+            "name": command.name,
+            "type": 1,
+            "options": [
+                {"name": name, "type": 3, "value": value}
+                for name, value in options.items()
+            ],
+        }
+        self.send_latency = send_latency
+        self.deferred_ephemeral = None
+        self.messages = 0
+        self.embeds = 0
+        self.__response = FakeInteractionResponse(self)
+        self.__followup = FakeFollowup(self)
+
+    @property
+    def response(self) -> FakeInteractionResponse:
+        """The recording interaction response."""
+        return self.__response
+
+    @property
+    def followup(self) -> FakeFollowup:
+        """The recording followup webhook."""
+        return self.__followup
+
+    @property
+    def guild(self) -> None:
+        """Synthetic interactions have no cached guild."""
+        return
+
+    async def delete_original_response(self, **_: Any) -> None:  # noqa: ANN401
+        """Nothing was sent to Discord, so there is nothing to delete."""
+
+    async def record(self, *_: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        """Count a sent or edited message and its embeds, after the send latency."""
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+
+        self.messages += 1
+        embeds = kwargs.get("embeds") or []
+        if kwargs.get("embed") is not None:
+            embeds = [kwargs["embed"]]
+        self.embeds += len(embeds)
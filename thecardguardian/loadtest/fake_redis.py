@@ -0,0 +1,118 @@
+"""Local stand-in for a Redis-compatible server, for the shared card cache."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+
+
+class FakeRedis:
+    """An in-memory server answering the RESP commands the card cache uses.
+
+    Supports PING, AUTH, SELECT, GET, SET (with EX) and DEL, with a single
+    keyspace. Every command waits for latency seconds, like a network hop.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """Initialize an empty fake server."""
+        self.latency = latency
+        self.calls = Counter()
+        self.bytes_stored = 0
+        self.url = None
+        self.__entries: dict[bytes, tuple[float | None, bytes]] = {}
+        self.__server = None
+        self.__clients: set[asyncio.StreamWriter] = set()
+
+    async def __read_command(self, reader: asyncio.StreamReader) -> list[bytes]:
+        """Read one RESP array of bulk strings.
+
+        This is a private method and should not be called outside of this class.
+        """
+        header = await reader.readuntil(b"\r\n")
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int((await reader.readuntil(b"\r\n"))[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+
+        return args
+
+    def __run_command(self, args: list[bytes]) -> bytes:
+        """Run a command and return its encoded reply.
+
+        This is a private method and should not be called outside of this class.
+        """
+        name = args[0].upper().decode()
+        self.calls[name] += 1
+
+        if name in {"PING", "AUTH", "SELECT"}:
+            return b"+OK\r\n" if name != "PING" else b"+PONG\r\n"
+
+        if name == "GET":
+            expires_at, value = self.__entries.get(args[1], (None, None))
+            if value is None or (expires_at is not None and expires_at < time.time()):
+                return b"$-1\r\n"
+            return f"${len(value)}\r\n".encode() + value + b"\r\n"
+
+        if name == "SET":
+            expires_at = None
+            if len(args) == 5 and args[3].upper() == b"EX":  # noqa: PLR2004
+                expires_at = time.time() + int(args[4])
+            _, previous = self.__entries.get(args[1], (None, b""))
+            self.__entries[args[1]] = (expires_at, args[2])
+            self.bytes_stored += len(args[2]) - len(previous)
+            return b"+OK\r\n"
+
+        if name == "DEL":
+            deleted = [self.__entries.pop(key, None) for key in args[1:]]
+            deleted = [entry for entry in deleted if entry is not None]
+            self.bytes_stored -= sum(len(value) for _, value in deleted)
+            return f":{len(deleted)}\r\n".encode()
+
+        return f"-ERR unknown command '{name}'\r\n".encode()
+
+    async def __serve(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Answer commands on one client connection until it closes.
+
+        This is a private method and should not be called outside of this class.
+        """
+        self.__clients.add(writer)
+        try:
+            while True:
+                args = await self.__read_command(reader)
+                await asyncio.sleep(self.latency)
+                writer.write(self.__run_command(args))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.__clients.discard(writer)
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returning the redis:// URL to connect to."""
+        self.__server = await asyncio.start_server(self.__serve, host, port)
+        bound_port = self.__server.sockets[0].getsockname()[1]
+        self.url = f"redis://{host}:{bound_port}/0"
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop serving, closing the client connections."""
+        if self.__server is not None:
+            self.__server.close()
+            for writer in self.__clients:
+                writer.close()
+            await self.__server.wait_closed()
+
+    def report(self) -> str:
+        """Get a one-line summary of the commands served."""
+        commands = ", ".join(
+            f"{count} {name}" for name, count in sorted(self.calls.items())
+        )
+        return (
+            f"Fake Redis: {commands or 'no commands'}, "
+            f"{len(self.__entries)} keys in {self.bytes_stored / 1024:.1f} KiB"
+        )
@@ -0,0 +1,380 @@
+"""Local stand-ins for the Scryfall and YGOPRODECK APIs."""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import hashlib
+import random
+from collections import Counter
+
+from aiohttp import web
+
+REQ_SUCCESS = 200
+REQ_NOT_MODIFIED = 304
+
+CARD_NAME_WORDS = [
+    "Dark",
+    "Magician",
+    "Dragon",
+    "Blue-Eyes",
+    "White",
+    "Lightning",
+    "Bolt",
+    "Pot",
+    "Greed",
+    "Stranger",
+    "Familiar",
+    "Knight",
+    "Shadow",
+    "Ancient",
+    "Elemental",
+    "Hero",
+    "Serpent",
+    "Warrior",
+    "Angel",
+    "Phoenix",
+    "Golem",
+    "Wraith",
+    "Titan",
+    "Sorcerer",
+]
+
+
+def generate_card_names(count: int, seed: int) -> list[str]:
+    """Generate a deterministic list of unique, card-like names."""
+    rng = random.Random(seed)  # noqa: S311
+    names = set()
+    while len(names) < count:
+        words = rng.sample(CARD_NAME_WORDS, rng.randint(2, 4))
+        suffix = rng.randint(1, count)
+        names.add(f"{' '.join(words)} {suffix}")
+
+    return sorted(names)
+
+
+class FakeUpstream:
+    """A single local HTTP server answering both Scryfall and YGOPRODECK routes.
+
+    Every request waits for latency seconds (with up to 50% jitter) and fails
+    with a 503 with probability error_rate, so caching and pooling strategies
+    can be compared under realistic upstream behaviour. Prices served by the
+    batched price routes drift by up to PRICE_DRIFT, so price watches fire.
+
+    Successful GET responses carry Cache-Control max-age and, unless
+    validators is False, an ETag and Last-Modified, and a request whose
+    If-None-Match or If-Modified-Since still matches is answered with a 304.
+    Random cards and drifted prices are sent with no-store instead.
+    """
+
+    SCRYFALL_PREFIX = "/scryfall"
+    YGOPRODECK_PREFIX = "/ygoprodeck/api/v7"
+    MAX_COLLECTION_IDENTIFIERS = 75
+    PRICE_DRIFT = 0.15
+
+    def __init__(  # noqa: PLR0913
+        self,
+        card_count: int = 2000,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        *,
+        max_age: int = 0,
+        validators: bool = True,
+    ) -> None:
+        """Initialize the fake upstream with a synthetic card pool."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self.validators = validators
+        self.last_modified = email.utils.formatdate(usegmt=True)
+        self.calls = Counter()
+        self.injected_errors = 0
+        self.not_modified = 0
+        self.card_names = generate_card_names(card_count, seed)
+        self.__rng = random.Random(seed)  # noqa: S311
+        self.__runner = None
+        self.base_url = None
+
+        self.__magic_cards = {
+            name.lower(): self.__build_magic_card(number, name)
+            for number, name in enumerate(self.card_names)
+        }
+        self.__yugioh_cards = {
+            name.lower(): self.__build_yugioh_card(number, name)
+            for number, name in enumerate(self.card_names)
+        }
+        self.__magic_cards_by_id = {
+            card["id"]: card for card in self.__magic_cards.values()
+        }
+        self.__yugioh_cards_by_id = {
+            str(card["id"]): card for card in self.__yugioh_cards.values()
+        }
+
+    @staticmethod
+    def __build_magic_card(number: int, name: str) -> dict:
+        """Build a Scryfall-shaped card object.
+
+        This is a private method and should not be called outside of this class.
+        """
+        return {
+            "object": "card",
+            "id": f"00000000-0000-0000-0000-{number:012d}",
+            "name": name,
+            "layout": "normal",
+            "type_line": "Creature — Test",
+            "oracle_text": f"{name} enters the battlefield. " * 4,
+            "prices": {"usd": f"{number % 50}.{number % 100:02d}", "tix": None},
+            "image_uris": {"png": f"https://cards.example/{number}.png"},
+        }
+
+    @staticmethod
+    def __build_yugioh_card(number: int, name: str) -> dict:
+        """Build a YGOPRODECK-shaped card object.
+
+        This is a private method and should not be called outside of this class.
+        """
+        return {
+            "id": number,
+            "name": name,
+            "type": "Effect Monster",
+            "desc": f"When {name} is Summoned, draw 1 card. " * 4,
+            "card_images": [{"image_url": f"https://cards.example/{number}.jpg"}],
+            "card_prices": [{"tcgplayer_price": f"{number % 30}.{number % 100:02d}"}],
+        }
+
+    def __find(self, cards: dict[str, dict], fragment: str) -> list[dict]:
+        """Get every card whose name contains the fragment, case-insensitively.
+
+        This is a private method and should not be called outside of this class.
+        """
+        fragment = fragment.lower()
+        return [card for name, card in cards.items() if fragment in name]
+
+    def __drift_price(self, price: str) -> str:
+        """Move a price by up to PRICE_DRIFT in either direction.
+
+        This is a private method and should not be called outside of this class.
+        """
+        drift = self.__rng.uniform(-self.PRICE_DRIFT, self.PRICE_DRIFT)
+        return f"{float(price) * (1 + drift):.2f}"
+
+    @web.middleware
+    async def __simulate_network(
+        self,
+        request: web.Request,
+        handler: web.RequestHandler,
+    ) -> web.StreamResponse:
+        """Count the call, then apply the configured latency and error rate.
+
+        This is a private method and should not be called outside of this class.
+        """
+        self.calls[request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.__rng.uniform(0.5, 1.5))
+
+        if self.__rng.random() < self.error_rate:
+            self.injected_errors += 1
+            return web.json_response({"error": "injected failure"}, status=503)
+
+        return await handler(request)
+
+    @web.middleware
+    async def __serve_validators(
+        self,
+        request: web.Request,
+        handler: web.RequestHandler,
+    ) -> web.StreamResponse:
+        """Add caching headers to a GET response, or answer 304 if it's unchanged.
+
+        This is a private method and should not be called outside of this class.
+        """
+        response = await handler(request)
+        if (
+            request.method != "GET"
+            or response.status != REQ_SUCCESS
+            or "Cache-Control" in response.headers
+        ):
+            return response
+
+        headers = {"Cache-Control": f"max-age={self.max_age}"}
+        if self.validators:
+            headers["ETag"] = f'"{hashlib.sha256(response.body).hexdigest()[:32]}"'
+            headers["Last-Modified"] = self.last_modified
+            if_none_match = request.headers.get("If-None-Match")
+            if (
+                if_none_match == headers["ETag"]
+                if if_none_match is not None
+                else request.headers.get("If-Modified-Since") == self.last_modified
+            ):
+                self.not_modified += 1
+                return web.Response(status=REQ_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+        return response
+
+    async def __scryfall_random(self, _: web.Request) -> web.Response:
+        """Serve /cards/random.
+
+        This is a private method and should not be called outside of this class.
+        """
+        return web.json_response(
+            self.__rng.choice(list(self.__magic_cards.values())),
+            headers={"Cache-Control": "no-store"},
+        )
+
+    async def __scryfall_card_names(self, _: web.Request) -> web.Response:
+        """Serve /catalog/card-names.
+
+        This is a private method and should not be called outside of this class.
+        """
+        return web.json_response({"object": "catalog", "data": self.card_names})
+
+    async def __scryfall_named(self, request: web.Request) -> web.Response:
+        """Serve /cards/named with exact or fuzzy matching.
+
+        This is a private method and should not be called outside of this class.
+        """
+        if "exact" in request.query:
+            card = self.__magic_cards.get(request.query["exact"].lower())
+            if card is not None:
+                return web.json_response(card)
+        else:
+            cards = self.__find(self.__magic_cards, request.query.get("fuzzy", ""))
+            if cards:
+                return web.json_response(cards[0])
+
+        return web.json_response({"object": "error"}, status=404)
+
+    async def __scryfall_search(self, request: web.Request) -> web.Response:
+        """Serve /cards/search, returning at most one 175-card page like Scryfall.
+
+        This is a private method and should not be called outside of this class.
+        """
+        cards = self.__find(self.__magic_cards, request.query.get("q", ""))
+        if not cards:
+            return web.json_response({"object": "error"}, status=404)
+
+        return web.json_response(
+            {"object": "list", "total_cards": len(cards), "data": cards[:175]},
+        )
+
+    async def __scryfall_collection(self, request: web.Request) -> web.Response:
+        """Serve POST /cards/collection by card id, with drifted prices.
+
+        This is a private method and should not be called outside of this class.
+        """
+        identifiers = (await request.json())["identifiers"]
+        if len(identifiers) > self.MAX_COLLECTION_IDENTIFIERS:
+            return web.json_response({"object": "error"}, status=422)
+
+        cards = []
+        not_found = []
+        for identifier in identifiers:
+            card = self.__magic_cards_by_id.get(identifier["id"])
+            if card is None:
+                not_found.append(identifier)
+                continue
+            prices = {"usd": self.__drift_price(card["prices"]["usd"]), "tix": None}
+            cards.append({**card, "prices": prices})
+
+        return web.json_response(
+            {"object": "list", "not_found": not_found, "data": cards},
+        )
+
+    async def __ygoprodeck_random(self, _: web.Request) -> web.Response:
+        """Serve /randomcard.php.
+
+        This is a private method and should not be called outside of this class.
+        """
+        return web.json_response(
+            {"data": [self.__rng.choice(list(self.__yugioh_cards.values()))]},
+            headers={"Cache-Control": "no-store"},
+        )
+
+    async def __ygoprodeck_cardinfo(self, request: web.Request) -> web.Response:
+        """Serve /cardinfo.php by name, fname, ids or with no filter at all.
+
+        Cards looked up by ids have drifted prices, so they're never cached.
+        This is a private method and should not be called outside of this class.
+        """
+        if "id" in request.query:
+            cards = [
+                {
+                    **card,
+                    "card_prices": [
+                        {
+                            "tcgplayer_price": self.__drift_price(
+                                card["card_prices"][0]["tcgplayer_price"],
+                            ),
+                        },
+                    ],
+                }
+                for card_id in request.query["id"].split(",")
+                if (card := self.__yugioh_cards_by_id.get(card_id)) is not None
+            ]
+        elif "name" in request.query:
+            card = self.__yugioh_cards.get(request.query["name"].lower())
+            cards = [] if card is None else [card]
+        elif "fname" in request.query:
+            cards = self.__find(self.__yugioh_cards, request.query["fname"])
+        else:
+            cards = list(self.__yugioh_cards.values())
+
+        if not cards:
+            return web.json_response(
+                {"error": "No card matching your query"},
+                status=400,
+            )
+
+        return web.json_response(
+            {"data": cards},
+            headers={"Cache-Control": "no-store"} if "id" in request.query else None,
+        )
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL of the server."""
+        app = web.Application(
+            middlewares=[self.__simulate_network, self.__serve_validators],
+        )
+        app.router.add_get(
+            f"{self.SCRYFALL_PREFIX}/cards/random",
+            self.__scryfall_random,
+        )
+        app.router.add_get(
+            f"{self.SCRYFALL_PREFIX}/catalog/card-names",
+            self.__scryfall_card_names,
+        )
+        app.router.add_get(
+            f"{self.SCRYFALL_PREFIX}/cards/named",
+            self.__scryfall_named,
+        )
+        app.router.add_get(
+            f"{self.SCRYFALL_PREFIX}/cards/search",
+            self.__scryfall_search,
+        )
+        app.router.add_post(
+            f"{self.SCRYFALL_PREFIX}/cards/collection",
+            self.__scryfall_collection,
+        )
+        app.router.add_get(
+            f"{self.YGOPRODECK_PREFIX}/randomcard.php",
+            self.__ygoprodeck_random,
+        )
+        app.router.add_get(
+            f"{self.YGOPRODECK_PREFIX}/cardinfo.php",
+            self.__ygoprodeck_cardinfo,
+        )
+
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # noqa: SLF001
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
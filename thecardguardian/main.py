@@ -1,14 +1,21 @@
 """Main calling code for running TheCardGuardian."""
 
-import os
+import time
 
-from BotModel.thecardguardian import TheCardGuardian
-from dotenv import load_dotenv
+LAUNCHED_AT = time.monotonic()
 
-load_dotenv()
-bot = TheCardGuardian()
-bot.load_extension("cogs.magic_tcg")
-bot.load_extension("cogs.thecardguardian_info")
-bot.load_extension("cogs.yugioh")
+import os  # noqa: E402
 
-bot.run(os.getenv("TOKEN"))
+from BotModel.thecardguardian import TheCardGuardian  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+if __name__ == "__main__":
+    load_dotenv()
+    bot = TheCardGuardian(launched_at=LAUNCHED_AT)
+    bot.load_extension("cogs.card_search")
+    bot.load_extension("cogs.magic_tcg")
+    bot.load_extension("cogs.thecardguardian_diagnostics")
+    bot.load_extension("cogs.thecardguardian_info")
+    bot.load_extension("cogs.yugioh")
+
+    bot.run(os.getenv("TOKEN"))
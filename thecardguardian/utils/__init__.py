@@ -0,0 +1 @@
+"""Utilities for TheCardGuardian bot."""
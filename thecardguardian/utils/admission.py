@@ -0,0 +1,294 @@
+"""Admission control for TheCardGuardian's slash commands.
+
+Every command has a cost, query searches (which can return thousands of
+cards) costing more than named searches. Commands run while the total cost in
+flight fits the bot's capacity, and otherwise wait in a per-guild queue. Queues
+are served by weighted fair queuing: each queued command gets a virtual finish
+time of its guild's last finish time plus cost / weight, and the earliest one
+runs next, so a guild spamming expensive commands only delays itself.
+
+A command is turned away right away with CommandBusy when its user already
+has USER_CONCURRENCY commands running or queued, when its guild would go over
+GUILD_CAPACITY, or when its guild's queue is full. It is also turned away if
+it waits longer than MAX_QUEUE_WAIT. Commands that have to queue are deferred
+first, so neither the wait nor their upstream calls count against Discord's 3
+second limit to answer an interaction.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import time
+from collections import Counter, deque
+from typing import TYPE_CHECKING, NoReturn
+
+import discord
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Hashable
+
+current_ticket: contextvars.ContextVar[AdmissionTicket | None] = contextvars.ContextVar(
+    "current_ticket",
+    default=None,
+)
+
+
+class CommandBusy(discord.CheckFailure):
+    """A command turned away by admission control, with the reply to send."""
+
+    def __init__(self, reason: str, message: str) -> None:
+        """Initialize the exception with a metrics reason and a user message."""
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionTicket:
+    """A command's claim on the bot's capacity, queued or running."""
+
+    def __init__(
+        self,
+        guild_key: Hashable,
+        user_id: int,
+        cost: int,
+        finish_tag: float,
+    ) -> None:
+        """Initialize a ticket, queued until its future is resolved."""
+        self.guild_key = guild_key
+        self.user_id = user_id
+        self.cost = cost
+        self.finish_tag = finish_tag
+        self.started = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """Per-guild fair scheduling and admission control for slash commands."""
+
+    COMMAND_COSTS = {  # noqa: RUF012
+        "cardsearch": 2,
+        "diagnostics": 0,
+        "magicquerysearch": 4,
+        "yugiohquerysearch": 4,
+    }
+    EPHEMERAL_COMMANDS = frozenset({"magicwatchlist", "yugiohwatchlist"})
+    DEFAULT_COST = 1
+    CAPACITY = 32
+    GUILD_CAPACITY = 12
+    USER_CONCURRENCY = 2
+    GUILD_QUEUE_LIMIT = 8
+    MAX_QUEUE_WAIT = 2.0
+    GUILD_BUSY_MESSAGE = "TheCardGuardian is busy with this server's other commands, please try again in a few seconds."  # noqa: E501
+    USER_BUSY_MESSAGE = (
+        "Your previous commands are still running, please try again once they're done."
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        capacity: int = CAPACITY,
+        guild_capacity: int = GUILD_CAPACITY,
+        user_concurrency: int = USER_CONCURRENCY,
+        guild_queue_limit: int = GUILD_QUEUE_LIMIT,
+        max_queue_wait: float = MAX_QUEUE_WAIT,
+        guild_weights: dict[int, float] | None = None,
+    ) -> None:
+        """Initialize the controller, guilds have a weight of 1 unless given."""
+        self.capacity = capacity
+        self.guild_capacity = guild_capacity
+        self.user_concurrency = user_concurrency
+        self.guild_queue_limit = guild_queue_limit
+        self.max_queue_wait = max_queue_wait
+        self.guild_weights = guild_weights or {}
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = Counter()
+        self.rejected_guilds = Counter()
+        self.queue_waits: deque[float] = deque(maxlen=1000)
+
+        self.__virtual_time = 0.0
+        self.__guild_finish_tags: dict[Hashable, float] = {}
+        self.__guild_costs = Counter()
+        self.__user_commands = Counter()
+        self.__queues: dict[Hashable, deque[AdmissionTicket]] = {}
+
+    def get_cost(self, command_name: str) -> int:
+        """Get the cost of a command, commands costing 0 skip admission control."""
+        return self.COMMAND_COSTS.get(command_name, self.DEFAULT_COST)
+
+    def __reject(self, reason: str, guild_key: Hashable) -> NoReturn:
+        """Count a rejection and raise CommandBusy for it.
+
+        This is a private method and should not be called outside of this class.
+        """
+        self.rejected[reason] += 1
+        self.rejected_guilds[guild_key] += 1
+        raise CommandBusy(
+            reason,
+            self.USER_BUSY_MESSAGE if reason == "user" else self.GUILD_BUSY_MESSAGE,
+        )
+
+    def __forget(self, ticket: AdmissionTicket) -> None:
+        """Remove a ticket's reservation on its guild's and user's share.
+
+        This is a private method and should not be called outside of this class.
+        """
+        self.__guild_costs[ticket.guild_key] -= ticket.cost
+        if self.__guild_costs[ticket.guild_key] <= 0:
+            del self.__guild_costs[ticket.guild_key]
+            self.__guild_finish_tags.pop(ticket.guild_key, None)
+        self.__user_commands[ticket.user_id] -= 1
+        if self.__user_commands[ticket.user_id] <= 0:
+            del self.__user_commands[ticket.user_id]
+
+    def __dispatch(self) -> None:
+        """Start queued commands, earliest virtual finish time first, while they fit.
+
+        This is a private method and should not be called outside of this class.
+        """
+        while self.__queues:
+            guild_key, queue = min(
+                self.__queues.items(),
+                key=lambda item: item[1][0].finish_tag,
+            )
+            ticket = queue[0]
+            if self.in_flight + ticket.cost > self.capacity:
+                return
+
+            queue.popleft()
+            if not queue:
+                del self.__queues[guild_key]
+            self.in_flight += ticket.cost
+            self.__virtual_time = ticket.finish_tag - ticket.cost / (
+                self.guild_weights.get(guild_key, 1)
+            )
+            ticket.granted.set_result(None)
+
+    async def admit(
+        self,
+        command_name: str,
+        guild_id: int | None,
+        user_id: int,
+        *,
+        on_queued: Callable[[], Awaitable[object]] | None = None,
+    ) -> AdmissionTicket | None:
+        """Wait for a command's turn to run, raising CommandBusy if turned away.
+
+        Returns None for commands that skip admission control. Direct messages
+        are queued as a guild of their own per user. on_queued is awaited once
+        if the command can't run right away, before it starts waiting.
+        """
+        cost = self.get_cost(command_name)
+        if cost == 0:
+            return None
+
+        guild_key = guild_id if guild_id is not None else ("dm", user_id)
+        if self.__user_commands[user_id] >= self.user_concurrency:
+            self.__reject("user", guild_key)
+
+        guild_cost = self.__guild_costs[guild_key]
+        if guild_cost and guild_cost + cost > self.guild_capacity:
+            self.__reject("guild", guild_key)
+
+        queue = self.__queues.get(guild_key, ())
+        if len(queue) >= self.guild_queue_limit:
+            self.__reject("queue", guild_key)
+
+        finish_tag = max(
+            self.__virtual_time,
+            self.__guild_finish_tags.get(guild_key, 0),
+        ) + cost / self.guild_weights.get(guild_key, 1)
+        ticket = AdmissionTicket(guild_key, user_id, cost, finish_tag)
+        self.__guild_finish_tags[guild_key] = finish_tag
+        self.__guild_costs[guild_key] += cost
+        self.__user_commands[user_id] += 1
+        self.__queues.setdefault(guild_key, deque()).append(ticket)
+        self.__dispatch()
+
+        if not ticket.granted.done():
+            await self.__wait(ticket, on_queued)
+
+        self.admitted += 1
+        return ticket
+
+    async def __wait(
+        self,
+        ticket: AdmissionTicket,
+        on_queued: Callable[[], Awaitable[object]] | None,
+    ) -> None:
+        """Wait for a queued ticket's turn, giving up its place if that fails.
+
+        This is a private method and should not be called outside of this class.
+        """
+        self.queued += 1
+        try:
+            if on_queued is not None:
+                await on_queued()
+            async with asyncio.timeout(self.max_queue_wait):
+                await asyncio.shield(ticket.granted)
+        except BaseException as exc:
+            if ticket.granted.done():
+                self.release(ticket)
+            else:
+                self.__queues[ticket.guild_key].remove(ticket)
+                if not self.__queues[ticket.guild_key]:
+                    del self.__queues[ticket.guild_key]
+                self.__forget(ticket)
+            if isinstance(exc, TimeoutError):
+                self.__reject("timeout", ticket.guild_key)
+            raise
+
+        self.queue_waits.append(time.monotonic() - ticket.started)
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        """Give a finished command's capacity back and start queued commands."""
+        self.in_flight -= ticket.cost
+        self.__forget(ticket)
+        self.__dispatch()
+
+    async def before_command(self, ctx: discord.ApplicationContext) -> None:
+        """Admit a slash command, to be called from the bot's before_invoke hook.
+
+        Queued commands are deferred while they wait, their replies then go out
+        as followups. Commands in EPHEMERAL_COMMANDS, whose replies are only
+        shown to their user, are deferred ephemerally so they stay private.
+        """
+        command_name = ctx.command.qualified_name
+        ticket = await self.admit(
+            command_name,
+            ctx.guild_id,
+            ctx.author.id,
+            on_queued=functools.partial(
+                ctx.defer,
+                ephemeral=command_name in self.EPHEMERAL_COMMANDS,
+            ),
+        )
+        current_ticket.set(ticket)
+
+    async def after_command(self, _: discord.ApplicationContext) -> None:
+        """Release a slash command's ticket, from the bot's after_invoke hook."""
+        ticket = current_ticket.get()
+        if ticket is not None:
+            current_ticket.set(None)
+            self.release(ticket)
+
+    def report(self) -> str:
+        """Get a plain-text summary of the admitted, queued and rejected commands."""
+        average_wait = (
+            sum(self.queue_waits) / len(self.queue_waits) if self.queue_waits else 0
+        )
+        rejected = ", ".join(
+            f"{count} {reason}" for reason, count in self.rejected.most_common()
+        )
+        lines = [
+            f"Admission: {self.admitted} admitted, {self.queued} queued ({average_wait * 1000:.0f} ms average wait), {sum(self.rejected.values())} busy ({rejected or 'none'})",  # noqa: E501
+            f"In flight: {self.in_flight}/{self.capacity} cost, {len(self.__queues)} guilds waiting",  # noqa: E501
+        ]
+        lines.extend(
+            f"Guild {guild_key}: {count} busy"
+            for guild_key, count in self.rejected_guilds.most_common(3)
+        )
+        return "\n".join(lines)
@@ -0,0 +1,322 @@
+"""Card record caches shared by TheCardGuardian's cogs.
+
+The backend is chosen with create_card_cache() from a URL:
+
+- "" or "memory://" keeps cards in this process only,
+- "redis://[:password@]host[:port][/db]" shares them between every bot process
+  or shard through a Redis-compatible server, with a short-lived in-process
+  near cache in front so hot cards don't cost a network hop.
+
+Shared values are stored in a compact binary form: a format byte followed by
+compact JSON, zlib-compressed when that makes it smaller. Cache failures are
+counted and treated as misses, so a cache outage never fails a command.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import json
+import time
+import urllib.parse
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+FORMAT_JSON = 1
+FORMAT_ZLIB_JSON = 2
+COMPRESS_THRESHOLD = 256
+
+
+class CardCacheError(Exception):
+    """An error reply from the shared card cache server."""
+
+
+def encode_card_value(value: Any) -> bytes:  # noqa: ANN401
+    """Encode a JSON-compatible card value in the compact binary cache format."""
+    data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+    if len(data) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return bytes([FORMAT_ZLIB_JSON]) + compressed
+
+    return bytes([FORMAT_JSON]) + data
+
+
+def decode_card_value(data: bytes) -> Any:  # noqa: ANN401
+    """Decode a value from the compact binary cache format.
+
+    Returns None for unknown formats and corrupt values, so entries written by
+    a newer version of the bot or damaged in the cache are treated as misses.
+    """
+    try:
+        if data[:1] == bytes([FORMAT_JSON]):
+            return json.loads(data[1:])
+
+        if data[:1] == bytes([FORMAT_ZLIB_JSON]):
+            return json.loads(zlib.decompress(data[1:]))
+    except (ValueError, zlib.error):
+        return None
+
+    return None
+
+
+class CardCache(abc.ABC):
+    """Base class of the card caches, keeping their hit and miss counts."""
+
+    def __init__(self) -> None:
+        """Initialize the cache statistics."""
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any:  # noqa: ANN401
+        """Get a cached value, or None if it isn't cached."""
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Cache a JSON-compatible value."""
+
+    async def close(self) -> None:  # noqa: B027
+        """Release the cache's connections, if any."""
+
+    def report(self) -> str:
+        """Get a one-line summary of the cache's effectiveness."""
+        return (
+            f"Card cache: {self.hits} hits, {self.misses} misses, {self.errors} errors"
+        )
+
+
+class MemoryCardCache(CardCache):
+    """In-process card cache, least recently used entries are evicted first."""
+
+    MAX_ENTRIES = 5000
+
+    def __init__(self, ttl: float, max_entries: int = MAX_ENTRIES) -> None:
+        """Initialize an empty cache keeping values for ttl seconds."""
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.__entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any:  # noqa: ANN401
+        """Get a cached value, or None if it isn't cached or has expired."""
+        entry = self.__entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.__entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Cache a value, evicting the least recently used one if full."""
+        self.__entries[key] = (time.monotonic() + self.ttl, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+
+class RedisCardCache(CardCache):
+    """Card cache stored in a Redis-compatible server.
+
+    Speaks just enough of the Redis protocol (RESP) for GET and SET over a small
+    pool of connections, so no client library is needed.
+    """
+
+    DEFAULT_PORT = 6379
+    POOL_SIZE = 4
+    TIMEOUT = 0.5
+
+    def __init__(self, url: str, ttl: float) -> None:
+        """Initialize the cache for a redis:// URL, connecting lazily."""
+        super().__init__()
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or self.DEFAULT_PORT
+        self.password = parsed.password
+        self.database = int(parsed.path.lstrip("/") or 0)
+        self.ttl = ttl
+        self.bytes_read = 0
+
+        self.__idle_connections = []
+        self.__pool_slots = asyncio.Semaphore(self.POOL_SIZE)
+
+    def __encode_command(self, *args: str | bytes) -> bytes:
+        """Encode a command as a RESP array of bulk strings.
+
+        This is a private method and should not be called outside of this class.
+        """
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode() if isinstance(arg, str) else arg
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+
+        return b"".join(parts)
+
+    async def __read_reply(self, reader: asyncio.StreamReader) -> Any:  # noqa: ANN401
+        """Read one RESP reply.
+
+        This is a private method and should not be called outside of this class.
+        """
+        line = await reader.readuntil(b"\r\n")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise CardCacheError(payload.decode(errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            self.bytes_read += length
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self.__read_reply(reader) for _ in range(length)]
+
+        msg = f"unexpected reply {line!r}"
+        raise CardCacheError(msg)
+
+    async def __connect(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open a connection, authenticated and on the configured database.
+
+        This is a private method and should not be called outside of this class.
+        """
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(self.__encode_command("AUTH", self.password))
+            await self.__read_reply(reader)
+        if self.database:
+            writer.write(self.__encode_command("SELECT", str(self.database)))
+            await self.__read_reply(reader)
+
+        return reader, writer
+
+    async def __execute(self, *args: str | bytes) -> Any:  # noqa: ANN401
+        """Run a command on a pooled connection and return its reply.
+
+        A connection that fails or times out mid-command is closed instead of
+        being returned to the pool, since its stream may be out of sync.
+        This is a private method and should not be called outside of this class.
+        """
+        async with self.__pool_slots:
+            connection = None
+            try:
+                async with asyncio.timeout(self.TIMEOUT):
+                    if self.__idle_connections:
+                        connection = self.__idle_connections.pop()
+                    else:
+                        connection = await self.__connect()
+                    reader, writer = connection
+                    writer.write(self.__encode_command(*args))
+                    reply = await self.__read_reply(reader)
+            except BaseException:
+                if connection is not None:
+                    connection[1].close()
+                raise
+
+            self.__idle_connections.append(connection)
+            return reply
+
+    async def get(self, key: str) -> Any:  # noqa: ANN401
+        """Get a cached value, or None if it isn't cached or the server failed."""
+        try:
+            data = await self.__execute("GET", key)
+        except (OSError, TimeoutError, asyncio.IncompleteReadError, CardCacheError):
+            self.errors += 1
+            return None
+
+        value = None if data is None else decode_card_value(data)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Cache a value for ttl seconds, ignoring server failures."""
+        try:
+            await self.__execute(
+                "SET",
+                key,
+                encode_card_value(value),
+                "EX",
+                str(max(int(self.ttl), 1)),
+            )
+        except (OSError, TimeoutError, asyncio.IncompleteReadError, CardCacheError):
+            self.errors += 1
+
+    async def close(self) -> None:
+        """Close the pooled connections."""
+        while self.__idle_connections:
+            _, writer = self.__idle_connections.pop()
+            writer.close()
+
+
+class NearCardCache(CardCache):
+    """A short-lived in-process cache in front of a shared one.
+
+    The near cache's ttl bounds how stale a card can be compared to the shared
+    cache, which other processes may have refreshed.
+    """
+
+    def __init__(self, near: MemoryCardCache, shared: CardCache) -> None:
+        """Initialize the cache from its near and shared layers."""
+        super().__init__()
+        self.near = near
+        self.shared = shared
+
+    async def get(self, key: str) -> Any:  # noqa: ANN401
+        """Get a cached value from the near cache, then from the shared one."""
+        value = await self.near.get(key)
+        if value is None:
+            value = await self.shared.get(key)
+            if value is not None:
+                await self.near.set(key, value)
+
+        return value
+
+    async def set(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Cache a value in both layers."""
+        await self.near.set(key, value)
+        await self.shared.set(key, value)
+
+    async def close(self) -> None:
+        """Close the shared cache's connections."""
+        await self.shared.close()
+
+    def report(self) -> str:
+        """Get a one-line summary of both layers."""
+        return (
+            f"Card cache: {self.near.hits} near hits, {self.shared.hits} shared hits, "
+            f"{self.shared.misses} misses, {self.shared.errors} errors"
+        )
+
+
+def create_card_cache(url: str, ttl: float, near_ttl: float) -> CardCache:
+    """Create the card cache for a URL, see the module docstring for the schemes.
+
+    ttl is how long cards are kept, near_ttl how long a process keeps its own
+    copy of a card from the shared cache.
+    """
+    scheme = urllib.parse.urlsplit(url).scheme
+    if scheme in {"", "memory"}:
+        return MemoryCardCache(ttl)
+
+    if scheme == "redis":
+        return NearCardCache(MemoryCardCache(near_ttl), RedisCardCache(url, ttl))
+
+    msg = f"unsupported card cache URL scheme {scheme!r}"
+    raise ValueError(msg)
@@ -0,0 +1,202 @@
+"""Offline fuzzy card name matcher for TheCardGuardian.
+
+The matcher keeps symmetric-delete indexes over every known card name, so a
+misspelled name can be resolved locally instead of asking the upstream API's
+fuzzy endpoint.
+
+Names are indexed by the deletes of both their first and last few characters.
+A name within MAX_DISTANCE edits of the query shares a delete with it in both
+indexes, so only names found through both get the full edit distance check.
+Large families such as "Elemental HERO ..." share a prefix but not a suffix,
+which keeps lookups well under a millisecond. Candidates whose character counts
+already differ too much are skipped before the edit distance is computed.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import Counter
+from typing import NamedTuple
+
+NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+class CardNameMatch(NamedTuple):
+    """A canonical card name and its edit distance from the query."""
+
+    name: str
+    distance: int
+
+
+def normalize_card_name(card_name: str) -> str:
+    """Normalize a card name for matching.
+
+    Accents are stripped, the name is lowercased and every run of punctuation or
+    whitespace is collapsed into a single space, so "Lazav, Familiar Stranger"
+    and "lazav familiar  stranger" normalize to the same key.
+    """
+    decomposed = unicodedata.normalize("NFKD", card_name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(" ", stripped.lower()).strip()
+
+
+def character_distance(source: Counter, target: Counter) -> int:
+    """Get a lower bound of the edit distance from two strings' character counts.
+
+    Each insertion or deletion changes one count by one, a substitution two
+    counts, and a transposition none, so this never exceeds edit_distance().
+    """
+    return max(sum((source - target).values()), sum((target - source).values()))
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int:
+    """Get the optimal string alignment distance between two strings.
+
+    Only the band of cells within max_distance of the diagonal is computed, as
+    every other cell exceeds it. Returns max_distance + 1 as soon as the
+    distance is known to exceed max_distance.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    too_far = max_distance + 1
+    previous_previous_row: list[int] = []
+    previous_row = [min(j, too_far) for j in range(len(target) + 1)]
+    for i, source_char in enumerate(source, start=1):
+        low = max(1, i - max_distance)
+        high = min(len(target), i + max_distance)
+        current_row = [too_far] * (len(target) + 1)
+        current_row[0] = min(i, too_far)
+        for j in range(low, high + 1):
+            target_char = target[j - 1]
+            cost = 0 if source_char == target_char else 1
+            current_row[j] = min(
+                previous_row[j] + 1,
+                current_row[j - 1] + 1,
+                previous_row[j - 1] + cost,
+            )
+            if (
+                i > 1
+                and j > 1
+                and source_char == target[j - 2]
+                and source[i - 2] == target_char
+            ):
+                current_row[j] = min(current_row[j], previous_previous_row[j - 2] + 1)
+
+        if min(current_row[low - 1 : high + 1]) > max_distance:
+            return too_far
+
+        previous_previous_row, previous_row = previous_row, current_row
+
+    return min(previous_row[-1], too_far)
+
+
+class CardNameMatcher:
+    """Symmetric-delete indexes over a set of canonical card names."""
+
+    MAX_DISTANCE = 2
+    PREFIX_LENGTH = 7
+    SUFFIX_LENGTH = 7
+    MAX_MATCHES = 5
+
+    def __init__(self, card_names: list[str]) -> None:
+        """Build the index for the given canonical card names.
+
+        Double-faced Magic: The Gathering names (i.e. "Fire // Ice") are also
+        indexed by each face, resolving to the full canonical name.
+        """
+        self.__canonical_names: dict[str, list[str]] = {}
+        self.__prefix_deletes: dict[str, list[str]] = {}
+        self.__suffix_deletes: dict[str, list[str]] = {}
+
+        for card_name in card_names:
+            keys = {normalize_card_name(card_name)}
+            if " // " in card_name:
+                keys.update(
+                    normalize_card_name(face) for face in card_name.split(" // ")
+                )
+
+            for key in keys:
+                if not key:
+                    continue
+
+                if key not in self.__canonical_names:
+                    self.__canonical_names[key] = []
+                    for delete in self.__get_deletes(key[: self.PREFIX_LENGTH]):
+                        self.__prefix_deletes.setdefault(delete, []).append(key)
+                    for delete in self.__get_deletes(key[-self.SUFFIX_LENGTH :]):
+                        self.__suffix_deletes.setdefault(delete, []).append(key)
+
+                if card_name not in self.__canonical_names[key]:
+                    self.__canonical_names[key].append(card_name)
+
+    def __len__(self) -> int:
+        """Get the number of indexed normalized names."""
+        return len(self.__canonical_names)
+
+    def __get_deletes(self, word: str) -> set[str]:
+        """Get every string reachable from word by up to MAX_DISTANCE deletions.
+
+        This is a private method and should not be called outside of this class.
+        """
+        deletes = {word}
+        frontier = {word}
+        for _ in range(self.MAX_DISTANCE):
+            frontier = {
+                candidate[:i] + candidate[i + 1 :]
+                for candidate in frontier
+                for i in range(len(candidate))
+            }
+            deletes.update(frontier)
+
+        return deletes
+
+    def lookup(self, card_name: str) -> list[CardNameMatch]:
+        """Get the closest canonical names for a card name, best match first.
+
+        An empty list means nothing is within MAX_DISTANCE edits.
+        """
+        query = normalize_card_name(card_name)
+        if not query:
+            return []
+
+        if query in self.__canonical_names:
+            return [CardNameMatch(name, 0) for name in self.__canonical_names[query]]
+
+        prefix_candidates = set()
+        for delete in self.__get_deletes(query[: self.PREFIX_LENGTH]):
+            prefix_candidates.update(self.__prefix_deletes.get(delete, ()))
+
+        candidates = set()
+        for delete in self.__get_deletes(query[-self.SUFFIX_LENGTH :]):
+            candidates.update(
+                candidate
+                for candidate in self.__suffix_deletes.get(delete, ())
+                if candidate in prefix_candidates
+            )
+
+        query_characters = Counter(query)
+        scored = []
+        for candidate in candidates:
+            if (
+                abs(len(candidate) - len(query)) > self.MAX_DISTANCE
+                or character_distance(query_characters, Counter(candidate))
+                > self.MAX_DISTANCE
+            ):
+                continue
+
+            distance = edit_distance(query, candidate, self.MAX_DISTANCE)
+            if distance <= self.MAX_DISTANCE:
+                scored.append((distance, abs(len(candidate) - len(query)), candidate))
+
+        scored.sort()
+        matches = []
+        for distance, _, candidate in scored:
+            matches.extend(
+                CardNameMatch(name, distance)
+                for name in self.__canonical_names[candidate]
+                if all(match.name != name for match in matches)
+            )
+
+        return matches[: self.MAX_MATCHES]
@@ -0,0 +1,140 @@
+"""Compact card records parsed from the Scryfall and YGOPRODECK APIs.
+
+The parsers take raw response bodies and only keep the fields TheCardGuardian
+displays, so they can run in a worker process and send back a small result.
+
+Records are shared between bot processes through the card cache, which may
+hold records written by another version of the bot. CARD_RECORD_VERSION goes in
+their cache keys and is bumped whenever a record's fields change, and records
+read back from the cache are checked with load_magic_card() and
+load_yugioh_cards().
+"""
+
+from __future__ import annotations
+
+import json
+from typing import NamedTuple
+
+
+class YugiohCardRecord(NamedTuple):
+    """The displayed fields of a YGOPRODECK card, and its id."""
+
+    id: int
+    name: str
+    type: str
+    desc: str
+    price: str | None
+    image_url: str
+
+
+CARD_RECORD_VERSION = 2
+MAGIC_CARD_FIELDS = ("id", "name", "layout", "type_line", "oracle_text")
+MAGIC_CARD_FACE_FIELDS = ("name", "type_line", "oracle_text")
+
+
+def trim_magic_card(card: dict) -> dict:
+    """Keep only the fields of a Scryfall card that the embeds use."""
+    trimmed = {field: card.get(field) for field in MAGIC_CARD_FIELDS}
+    trimmed["prices"] = {
+        "usd": card["prices"].get("usd"),
+        "tix": card["prices"].get("tix"),
+    }
+    if "image_uris" in card:
+        trimmed["image_uris"] = {"png": card["image_uris"]["png"]}
+
+    if "card_faces" in card:
+        trimmed["card_faces"] = []
+        for face in card["card_faces"]:
+            trimmed_face = {field: face.get(field) for field in MAGIC_CARD_FACE_FIELDS}
+            if "image_uris" in face:
+                trimmed_face["image_uris"] = {"png": face["image_uris"]["png"]}
+            trimmed["card_faces"].append(trimmed_face)
+
+    return trimmed
+
+
+def load_magic_card(value: object) -> dict | None:
+    """Check a trimmed Scryfall card read from the card cache.
+
+    Returns None if the value doesn't have every field trim_magic_card() keeps.
+    """
+    if (
+        not isinstance(value, dict)
+        or any(value.get(field) is None for field in ("id", "name"))
+        or any(field not in value for field in MAGIC_CARD_FIELDS)
+        or not isinstance(value.get("prices"), dict)
+    ):
+        return None
+
+    return value
+
+
+def parse_magic_cards(body: bytes) -> list[dict]:
+    """Parse a Scryfall list response into trimmed cards."""
+    return [trim_magic_card(card) for card in json.loads(body)["data"]]
+
+
+def parse_price(price: str | None) -> float | None:
+    """Parse a provider's price string, None when the card has no price."""
+    if not price:
+        return None
+
+    try:
+        return float(price)
+    except ValueError:
+        return None
+
+
+def parse_magic_card_prices(body: bytes) -> dict[str, float | None]:
+    """Parse a Scryfall collection response into USD prices by card id."""
+    return {
+        card["id"]: parse_price(card["prices"].get("usd"))
+        for card in json.loads(body)["data"]
+    }
+
+
+def parse_magic_card_names(body: bytes) -> list[str]:
+    """Parse a Scryfall catalog response into card names."""
+    return json.loads(body)["data"]
+
+
+def parse_yugioh_cards(body: bytes) -> list[YugiohCardRecord]:
+    """Parse a YGOPRODECK cardinfo response into card records."""
+    return [
+        YugiohCardRecord(
+            card["id"],
+            card["name"],
+            card["type"],
+            card["desc"],
+            card["card_prices"][0]["tcgplayer_price"],
+            card["card_images"][0]["image_url"],
+        )
+        for card in json.loads(body)["data"]
+    ]
+
+
+def parse_yugioh_card_names(body: bytes) -> list[str]:
+    """Parse a YGOPRODECK cardinfo response into card names."""
+    return [card["name"] for card in json.loads(body)["data"]]
+
+
+def parse_yugioh_card_prices(body: bytes) -> dict[str, float | None]:
+    """Parse a YGOPRODECK cardinfo response into USD prices by card id."""
+    return {
+        str(card["id"]): parse_price(card["card_prices"][0]["tcgplayer_price"])
+        for card in json.loads(body)["data"]
+    }
+
+
+def load_yugioh_cards(value: object) -> list[YugiohCardRecord] | None:
+    """Rebuild YGOPRODECK card records read from the card cache.
+
+    Returns None if the value isn't a list of records with the current fields.
+    """
+    if not isinstance(value, list) or not all(
+        isinstance(card, list) and len(card) == len(YugiohCardRecord._fields)
+        for card in value
+    ):
+        return None
+
+    return [YugiohCardRecord(*card) for card in value]
@@ -0,0 +1,241 @@
+"""Event loop and slash command diagnostics for TheCardGuardian.
+
+Diagnostics are off unless enabled, in which case they keep:
+
+- a loop lag sampler, with a watchdog thread that captures the event loop's
+  stack whenever it stops ticking for longer than the lag threshold,
+- a per-command breakdown of upstream, parse, render and send time,
+- optionally, sampled stacks of the event loop thread for commands slower than
+  the slow command threshold.
+
+When disabled, the command hooks return immediately and phase() does a single
+context variable lookup.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    import discord
+
+current_trace: contextvars.ContextVar[CommandTrace | None] = contextvars.ContextVar(
+    "current_trace",
+    default=None,
+)
+
+
+class CommandTrace:
+    """Timing of a single slash command invocation."""
+
+    def __init__(self, name: str, guild_id: int | None) -> None:
+        """Start timing a command."""
+        self.name = name
+        self.guild_id = guild_id
+        self.started = time.monotonic()
+        self.duration = None
+        self.phases = Counter()
+        self.profile = None
+
+    @property
+    def other(self) -> float:
+        """Time not attributed to any phase."""
+        return max(self.duration - sum(self.phases.values()), 0)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the time spent in the block to a phase of the current command.
+
+    Used for the "upstream", "parse", "render" and "send" breakdown. It is a
+    no-op outside of a traced command, so it is safe to use from shared code.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.phases[name] += time.monotonic() - started
+
+
+class Diagnostics:
+    """Loop lag monitor, slow callback watchdog and slash command tracer."""
+
+    LAG_SAMPLE_INTERVAL = 0.05
+    PROFILE_SAMPLE_INTERVAL = 0.005
+    PROFILE_STACK_DEPTH = 6
+    MAX_PROFILE_SAMPLES = 20000
+    MAX_RECENT_COMMANDS = 200
+    MAX_SLOW_CALLBACKS = 20
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        profile: bool = False,
+        slow_command_threshold: float = 2.0,
+        loop_lag_threshold: float = 0.1,
+    ) -> None:
+        """Initialize the diagnostics, nothing runs until start() is called."""
+        self.enabled = enabled
+        self.profile = enabled and profile
+        self.slow_command_threshold = slow_command_threshold
+        self.loop_lag_threshold = loop_lag_threshold
+
+        self.recent_commands: deque[CommandTrace] = deque(
+            maxlen=self.MAX_RECENT_COMMANDS,
+        )
+        self.slow_callbacks: deque[tuple[float, str]] = deque(
+            maxlen=self.MAX_SLOW_CALLBACKS,
+        )
+        self.loop_lags: deque[float] = deque(maxlen=1200)
+        self.max_loop_lag = 0.0
+
+        self.__loop_thread_id = None
+        self.__heartbeat = time.monotonic()
+        self.__lag_task = None
+        self.__active_commands = 0
+        self.__samples: deque[tuple[float, tuple[str, ...]]] = deque(
+            maxlen=self.MAX_PROFILE_SAMPLES,
+        )
+
+    def start(self) -> None:
+        """Start the loop lag sampler and watchdog on the running event loop.
+
+        Does nothing when diagnostics are disabled or already started.
+        """
+        if not self.enabled or self.__lag_task is not None:
+            return
+
+        self.__loop_thread_id = threading.get_ident()
+        self.__heartbeat = time.monotonic()
+        self.__lag_task = asyncio.get_running_loop().create_task(
+            self.__sample_loop_lag(),
+        )
+        threading.Thread(
+            target=self.__watch_loop,
+            name="TheCardGuardian diagnostics",
+            daemon=True,
+        ).start()
+
+    async def __sample_loop_lag(self) -> None:
+        """Measure how late the event loop wakes up from a fixed sleep.
+
+        This is a private method and should not be called outside of this class.
+        """
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.LAG_SAMPLE_INTERVAL)
+            self.__heartbeat = time.monotonic()
+            lag = self.__heartbeat - before - self.LAG_SAMPLE_INTERVAL
+            self.loop_lags.append(lag)
+            self.max_loop_lag = max(self.max_loop_lag, lag)
+
+    def __get_loop_stack(self, depth: int | None = None) -> list[str]:
+        """Get the event loop thread's current stack, innermost frame last.
+
+        This is a private method and should not be called outside of this class.
+        """
+        frame = sys._current_frames().get(self.__loop_thread_id)  # noqa: SLF001
+        if frame is None:
+            return []
+
+        return [
+            f"{summary.filename}:{summary.lineno} {summary.name}"
+            for summary in traceback.extract_stack(frame, limit=depth)
+        ]
+
+    def __watch_loop(self) -> None:
+        """Report event loop stalls and take profile samples, in its own thread.
+
+        This is a private method and should not be called outside of this class.
+        """
+        reported_heartbeat = None
+        while True:
+            time.sleep(
+                self.PROFILE_SAMPLE_INTERVAL
+                if self.profile and self.__active_commands
+                else self.loop_lag_threshold / 2,
+            )
+            now = time.monotonic()
+
+            if self.profile and self.__active_commands:
+                stack = tuple(self.__get_loop_stack(self.PROFILE_STACK_DEPTH))
+                self.__samples.append((now, stack))
+
+            stalled_for = now - self.__heartbeat - self.LAG_SAMPLE_INTERVAL
+            if (
+                stalled_for > self.loop_lag_threshold
+                and reported_heartbeat != self.__heartbeat
+            ):
+                reported_heartbeat = self.__heartbeat
+                stack = "\n".join(self.__get_loop_stack()[-8:])
+                self.slow_callbacks.append((stalled_for, stack))
+                print(  # noqa: T201
+                    f"Event loop blocked for over {stalled_for * 1000:.0f} ms at:\n{stack}",  # noqa: E501
+                )
+
+    async def before_command(self, ctx: discord.ApplicationContext) -> None:
+        """Start tracing a slash command, registered as the bot's before_invoke hook."""
+        if not self.enabled:
+            return
+
+        current_trace.set(CommandTrace(ctx.command.qualified_name, ctx.guild_id))
+        self.__active_commands += 1
+
+    async def after_command(self, _: discord.ApplicationContext) -> None:
+        """Finish tracing a slash command, registered as the bot's after_invoke hook."""
+        trace = current_trace.get()
+        if trace is None:
+            return
+
+        current_trace.set(None)
+        self.__active_commands -= 1
+        trace.duration = time.monotonic() - trace.started
+
+        if self.profile and trace.duration > self.slow_command_threshold:
+            leaf_frames = Counter(
+                stack[-1]
+                for sampled_at, stack in list(self.__samples)
+                if sampled_at >= trace.started and stack
+            )
+            trace.profile = leaf_frames.most_common(10)
+
+        self.recent_commands.append(trace)
+
+    def get_slowest_commands(self, count: int = 5) -> list[CommandTrace]:
+        """Get the slowest recently finished commands, slowest first."""
+        return sorted(
+            self.recent_commands,
+            key=lambda trace: trace.duration,
+            reverse=True,
+        )[:count]
+
+    def report(self) -> str:
+        """Get a plain-text summary of the loop lag and the slowest commands."""
+        if not self.enabled:
+            return "Diagnostics are disabled."
+
+        average_lag = sum(self.loop_lags) / len(self.loop_lags) if self.loop_lags else 0
+        lines = [
+            f"Loop lag: {average_lag * 1000:.1f} ms average, {self.max_loop_lag * 1000:.1f} ms max, {len(self.slow_callbacks)} stalls",  # noqa: E501
+        ]
+        lines.extend(
+            f"{trace.name}: {trace.duration * 1000:.0f} ms (upstream {trace.phases['upstream'] * 1000:.0f}, parse {trace.phases['parse'] * 1000:.0f}, render {trace.phases['render'] * 1000:.0f}, send {trace.phases['send'] * 1000:.0f}, other {trace.other * 1000:.0f})"  # noqa: E501
+            for trace in self.get_slowest_commands()
+        )
+        return "\n".join(lines)
@@ -0,0 +1,289 @@
+"""On-disk HTTP cache for TheCardGuardian's provider requests.
+
+Responses are stored with their validators (ETag / Last-Modified) and reused
+while fresh according to Cache-Control max-age. Stale responses are revalidated
+with a conditional request, so an unchanged resource costs a 304 instead of a
+full download.
+
+The directory is bounded to max_size bytes: once a store goes over it, the
+least recently stored entries are deleted until it is back under
+PRUNE_TARGET of the limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from utils.diagnostics import phase
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    import aiohttp
+
+REQ_SUCCESS = 200
+REQ_NOT_MODIFIED = 304
+
+
+class CachedResponse(NamedTuple):
+    """The status and body of a (possibly cached) response."""
+
+    status: int
+    body: bytes
+
+    def json(self) -> Any:  # noqa: ANN401
+        """Decode the response body as JSON."""
+        return json.loads(self.body)
+
+
+class HTTPCache:
+    """Conditional-request HTTP cache stored in a directory.
+
+    Passing None as the directory disables caching, every request then goes
+    straight to the network.
+    """
+
+    MAX_SIZE = 256 * 1024 * 1024
+    PRUNE_TARGET = 0.9
+
+    def __init__(self, directory: Path | None, max_size: int = MAX_SIZE) -> None:
+        """Initialize the cache in the given directory, creating it if needed."""
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_errors = 0
+        self.bytes_saved = 0
+
+        self.__size = 0
+        self.__size_lock = threading.Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.__size = sum(
+                path.stat().st_size
+                for path in self.directory.iterdir()
+                if path.is_file()
+            )
+
+    def __get_paths(self, url: str) -> tuple[Path, Path]:
+        """Get the metadata and body paths of a cached URL.
+
+        This is a private method and should not be called outside of this class.
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def __load(self, url: str) -> tuple[dict, bytes] | None:
+        """Load a cached entry from disk.
+
+        This is a private method and should not be called outside of this class.
+        """
+        meta_path, body_path = self.__get_paths(url)
+        try:
+            meta = json.loads(meta_path.read_bytes())
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("url") != url:
+            return None
+
+        return meta, body
+
+    def __write(self, path: Path, data: bytes) -> int:
+        """Atomically replace a file's content, returning how much it grew.
+
+        Every write goes through its own temporary file, so concurrent writes
+        of the same entry don't clash.
+        This is a private method and should not be called outside of this class.
+        """
+        old_size = 0
+        with contextlib.suppress(OSError):
+            old_size = path.stat().st_size
+
+        fd, temp_name = tempfile.mkstemp(
+            dir=self.directory,
+            prefix=f"{path.name}.",
+            suffix=".tmp",
+        )
+        temp_path = Path(temp_name)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            temp_path.replace(path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        return len(data) - old_size
+
+    def __store(self, url: str, meta: dict, body: bytes | None) -> None:
+        """Write a cached entry to disk, keeping the body if None.
+
+        A failed write, e.g. on a full disk, only counts as a store error, so
+        it never fails the request being answered. The metadata is only
+        written once the body is, so it never describes a body it didn't store.
+        This is a private method and should not be called outside of this class.
+        """
+        meta_path, body_path = self.__get_paths(url)
+        size_change = 0
+        try:
+            for path, data in (
+                (body_path, body),
+                (meta_path, json.dumps({"url": url, **meta}).encode()),
+            ):
+                if data is not None:
+                    size_change += self.__write(path, data)
+        except OSError:
+            self.store_errors += 1
+
+        with self.__size_lock:
+            self.__size += size_change
+            if self.__size > self.max_size:
+                try:
+                    self.__prune()
+                except OSError:
+                    self.store_errors += 1
+
+    def __prune(self) -> None:
+        """Delete the least recently stored entries until under PRUNE_TARGET.
+
+        Must be called with the size lock held.
+        This is a private method and should not be called outside of this class.
+        """
+        entries = []
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path))
+            except OSError:
+                continue
+
+        for _, meta_path in sorted(entries):
+            if self.__size <= self.max_size * self.PRUNE_TARGET:
+                break
+
+            for path in (meta_path, meta_path.with_suffix(".body")):
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except OSError:
+                    continue
+                self.__size -= size
+            self.evictions += 1
+
+    @staticmethod
+    def __get_freshness(headers: Mapping[str, str]) -> dict | None:
+        """Get the validators and expiry of a response, or None if uncacheable.
+
+        This is a private method and should not be called outside of this class.
+        """
+        directives = {}
+        for directive in headers.get("Cache-Control", "").split(","):
+            name, _, value = directive.strip().partition("=")
+            directives[name.lower()] = value.strip('"')
+
+        if "no-store" in directives:
+            return None
+
+        max_age = 0
+        if "no-cache" not in directives:
+            try:
+                max_age = int(directives.get("max-age", 0))
+            except ValueError:
+                max_age = 0
+
+        if max_age == 0 and "ETag" not in headers and "Last-Modified" not in headers:
+            return None
+
+        return {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "expires_at": time.time() + max_age,
+        }
+
+    async def get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        *,
+        store: bool = True,
+    ) -> CachedResponse:
+        """GET a URL through the cache.
+
+        Set store to False for resources that should never be reused, such as
+        random card endpoints. The time spent counts as the current command's
+        upstream time.
+        """
+        with phase("upstream"):
+            return await self.__get(session, url, store=store)
+
+    async def __get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        *,
+        store: bool,
+    ) -> CachedResponse:
+        """GET a URL through the cache, see get().
+
+        This is a private method and should not be called outside of this class.
+        """
+        if self.directory is None or not store:
+            async with session.get(url) as req:
+                return CachedResponse(req.status, await req.read())
+
+        cached = await asyncio.to_thread(self.__load, url)
+        headers = {}
+        if cached is not None:
+            meta, body = cached
+            if time.time() < meta["expires_at"]:
+                self.hits += 1
+                self.bytes_saved += len(body)
+                return CachedResponse(REQ_SUCCESS, body)
+
+            if meta["etag"] is not None:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"] is not None:
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with session.get(url, headers=headers) as req:
+            if req.status == REQ_NOT_MODIFIED and cached is not None:
+                self.revalidations += 1
+                self.bytes_saved += len(body)
+                freshness = self.__get_freshness(req.headers)
+                if freshness is not None:
+                    freshness["etag"] = freshness["etag"] or meta["etag"]
+                    freshness["last_modified"] = (
+                        freshness["last_modified"] or meta["last_modified"]
+                    )
+                    await asyncio.to_thread(self.__store, url, freshness, None)
+                return CachedResponse(REQ_SUCCESS, body)
+
+            self.misses += 1
+            response = CachedResponse(req.status, await req.read())
+            freshness = self.__get_freshness(req.headers)
+
+        if response.status == REQ_SUCCESS and freshness is not None:
+            await asyncio.to_thread(self.__store, url, freshness, response.body)
+
+        return response
+
+    def report(self) -> str:
+        """Get a one-line summary of the cache's hit rate and bytes saved."""
+        return (
+            f"HTTP cache: {self.hits} fresh hits, {self.revalidations} revalidated, "
+            f"{self.misses} misses, {self.evictions} evicted, "
+            f"{self.store_errors} store errors, "
+            f"{self.bytes_saved / 1024:.1f} KiB saved"
+        )
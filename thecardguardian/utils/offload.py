@@ -0,0 +1,108 @@
+"""Process pool offload for CPU-heavy card work.
+
+Small payloads are cheaper to handle inline than to ship to another process,
+so only payloads of at least INLINE_PAYLOAD_LIMIT bytes go to the pool. This
+keeps multi-megabyte parses off the event loop that serves the gateway
+heartbeats.
+
+If a worker dies, the pool is broken for good, so it is dropped to be started
+again on next use and the payload that hit it is parsed inline instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, TypeVar
+
+from utils.diagnostics import phase
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+T = TypeVar("T")
+
+
+class CardWorkExecutor:
+    """Runs card parsing inline or in a process pool depending on payload size."""
+
+    INLINE_PAYLOAD_LIMIT = 256 * 1024
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        inline_payload_limit: int = INLINE_PAYLOAD_LIMIT,
+    ) -> None:
+        """Initialize the executor, the pool is only started when first needed.
+
+        A max_workers of 0 disables the pool and runs everything inline.
+        """
+        self.max_workers = max_workers
+        self.inline_payload_limit = inline_payload_limit
+        self.inline_runs = 0
+        self.offloaded_runs = 0
+        self.broken_pools = 0
+        self.__pool = None
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        """Get the process pool, starting it if needed.
+
+        Workers come from a fork server, so they don't inherit the bot's threads
+        or open connections. Workers still import the main module, which is why
+        main.py only starts the bot under its __main__ guard.
+        This is a private method and should not be called outside of this class.
+        """
+        if self.__pool is None:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["utils.card_records"])
+            self.__pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+            )
+
+        return self.__pool
+
+    async def run(self, parser: Callable[[bytes], T], payload: bytes) -> T:
+        """Run parser on payload, in the process pool if the payload is large.
+
+        parser must be a module-level function so it can be sent to a worker.
+        The time spent counts as the current command's parse time.
+        """
+        with phase("parse"):
+            if self.max_workers == 0 or len(payload) < self.inline_payload_limit:
+                self.inline_runs += 1
+                return parser(payload)
+
+            pool = self.__get_pool()
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    pool,
+                    parser,
+                    payload,
+                )
+            except BrokenProcessPool:
+                if self.__pool is pool:
+                    self.broken_pools += 1
+                    self.__pool = None
+                    pool.shutdown(wait=False, cancel_futures=True)
+                self.inline_runs += 1
+                return parser(payload)
+
+            self.offloaded_runs += 1
+            return result
+
+    def shutdown(self) -> None:
+        """Stop the process pool, if it was started."""
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=False, cancel_futures=True)
+            self.__pool = None
+
+    def report(self) -> str:
+        """Get a one-line summary of how much work was offloaded."""
+        return (
+            f"Card work: {self.inline_runs} parsed inline, "
+            f"{self.offloaded_runs} offloaded to {self.max_workers} workers, "
+            f"{self.broken_pools} broken pools restarted"
+        )
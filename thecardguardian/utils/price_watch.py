@@ -0,0 +1,192 @@
+"""Card price watchlists shared by the game cogs.
+
+Watches are deduplicated by card, so a card watched by many users is fetched
+once per refresh. Each refresh is diffed against the previous price snapshot
+and only the watches of cards whose price changed are checked.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from utils.card_name_matcher import normalize_card_name
+
+
+class PriceWatch(NamedTuple):
+    """A user's watch on a card's price, alerted in the channel it was made in.
+
+    threshold alerts when the price crosses it in either direction, percent
+    when the price has moved by that much since the watch was made or last
+    alerted.
+    """
+
+    user_id: int
+    channel_id: int
+    card_id: str
+    card_name: str
+    threshold: float | None
+    percent: float | None
+
+
+class PriceAlert(NamedTuple):
+    """A watch that fired, with the prices it compared."""
+
+    watch: PriceWatch
+    old_price: float
+    new_price: float
+
+    def describe(self) -> str:
+        """Get the alert's message line, mentioning the watching user."""
+        if self.watch.threshold is not None and (
+            min(self.old_price, self.new_price)
+            < self.watch.threshold
+            <= max(self.old_price, self.new_price)
+        ):
+            reason = f"crossed {self.watch.threshold:.2f}$"
+        else:
+            change = (self.new_price - self.old_price) / self.old_price * 100
+            reason = f"moved {change:+.1f}%"
+
+        return f"<@{self.watch.user_id}> `{self.watch.card_name}` {reason}: {self.old_price:.2f}$ -> {self.new_price:.2f}$"  # noqa: E501
+
+
+class PriceWatchList:
+    """Every user's price watches for one game, keyed by card."""
+
+    MAX_WATCHES_PER_USER = 25
+
+    def __init__(self, game: str) -> None:
+        """Initialize an empty watchlist for a game, named in its report."""
+        self.game = game
+        self.alerts_fired = 0
+        self.cards_changed = 0
+        self.__watches: dict[str, dict[int, PriceWatch]] = {}
+        self.__user_watches: dict[int, dict[str, PriceWatch]] = {}
+        self.__prices: dict[str, float | None] = {}
+        self.__baselines: dict[tuple[str, int], float] = {}
+
+    @property
+    def card_ids(self) -> list[str]:
+        """The ids of every watched card, each listed once."""
+        return list(self.__watches)
+
+    def get_price(self, card_id: str) -> float | None:
+        """Get a watched card's last known price."""
+        return self.__prices.get(card_id)
+
+    def get_user_watches(self, user_id: int) -> list[PriceWatch]:
+        """Get a user's watches."""
+        return list(self.__user_watches.get(user_id, {}).values())
+
+    def add(self, watch: PriceWatch, price: float | None) -> bool:
+        """Add or replace a user's watch on a card.
+
+        price, the card's price when the watch is made, only seeds the snapshot
+        of cards nobody watched yet. Otherwise it may be a staler cached price
+        than the last refresh, so the watch starts from the snapshot instead.
+
+        Returns False when the user already watches MAX_WATCHES_PER_USER other
+        cards.
+        """
+        user_watches = self.__user_watches.setdefault(watch.user_id, {})
+        if (
+            watch.card_id not in user_watches
+            and len(user_watches) >= self.MAX_WATCHES_PER_USER
+        ):
+            return False
+
+        if watch.card_id not in self.__watches:
+            self.__prices[watch.card_id] = price
+
+        user_watches[watch.card_id] = watch
+        self.__watches.setdefault(watch.card_id, {})[watch.user_id] = watch
+        baseline = self.__prices[watch.card_id]
+        if baseline:
+            self.__baselines[watch.card_id, watch.user_id] = baseline
+        else:
+            self.__baselines.pop((watch.card_id, watch.user_id), None)
+        return True
+
+    def remove(self, user_id: int, card_name: str) -> PriceWatch | None:
+        """Remove a user's watch on a card by name, returning the removed watch."""
+        normalized_card_name = normalize_card_name(card_name)
+        for watch in self.get_user_watches(user_id):
+            if normalize_card_name(watch.card_name) == normalized_card_name:
+                break
+        else:
+            return None
+
+        del self.__user_watches[user_id][watch.card_id]
+        del self.__watches[watch.card_id][user_id]
+        self.__baselines.pop((watch.card_id, user_id), None)
+        if not self.__watches[watch.card_id]:
+            del self.__watches[watch.card_id]
+            del self.__prices[watch.card_id]
+        return watch
+
+    def __check(
+        self,
+        watch: PriceWatch,
+        old_price: float | None,
+        new_price: float,
+    ) -> PriceAlert | None:
+        """Check whether a watch fires on a price change.
+
+        This is a private method and should not be called outside of this class.
+        """
+        if (
+            watch.threshold is not None
+            and old_price is not None
+            and min(old_price, new_price) < watch.threshold <= max(old_price, new_price)
+        ):
+            self.__baselines[watch.card_id, watch.user_id] = new_price
+            return PriceAlert(watch, old_price, new_price)
+
+        if watch.percent is None:
+            return None
+
+        baseline = self.__baselines.get((watch.card_id, watch.user_id))
+        if not baseline:
+            self.__baselines[watch.card_id, watch.user_id] = new_price
+            return None
+
+        if abs(new_price - baseline) / baseline * 100 >= watch.percent:
+            self.__baselines[watch.card_id, watch.user_id] = new_price
+            return PriceAlert(watch, baseline, new_price)
+
+        return None
+
+    def apply_prices(self, prices: dict[str, float | None]) -> list[PriceAlert]:
+        """Update the snapshot with refreshed prices, returning the alerts that fired.
+
+        Cards missing from prices, i.e. from a failed batch, keep their last
+        known price.
+        """
+        alerts = []
+        for card_id, new_price in prices.items():
+            watches = self.__watches.get(card_id)
+            old_price = self.__prices.get(card_id)
+            if watches is None or new_price == old_price:
+                continue
+
+            self.cards_changed += 1
+            self.__prices[card_id] = new_price
+            if new_price is None:
+                continue
+
+            for watch in watches.values():
+                alert = self.__check(watch, old_price, new_price)
+                if alert is not None:
+                    alerts.append(alert)
+
+        self.alerts_fired += len(alerts)
+        return alerts
+
+    def report(self) -> str:
+        """Get a one-line summary of the watchlist."""
+        watch_count = sum(len(watches) for watches in self.__watches.values())
+        return (
+            f"{self.game} price watch: {watch_count} watches on "
+            f"{len(self.__watches)} cards, {self.cards_changed} price changes, "
+            f"{self.alerts_fired} alerts fired"
+        )